@@ -0,0 +1,63 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Interpreted run() against the compiled engine on the same episodes.
+#
+#   python benchmarks/compiler_bench.py [episodes]
+
+import sys
+import time
+
+from codingerrors import run
+from codingerrors.compiler import get_engine
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+from codingerrors.testing import random_episodes
+
+
+def main(n: int = 20000):
+    standards_dict = _build_standards_dict(icd10_standards_dict)
+    episodes = random_episodes("icd10", n=n)
+
+    start = time.perf_counter()
+    engine = get_engine("icd10")
+    print("compile: %.3fs" % (time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for codes in episodes:
+        run(codes, standards_dict=standards_dict)
+    interpreted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for codes in episodes:
+        engine.check(codes)
+    compiled = time.perf_counter() - start
+
+    print("run():        %10.0f episodes/s" % (n / interpreted))
+    print("Engine.check: %10.0f episodes/s" % (n / compiled))
+    print("speedup:      %10.1fx" % (interpreted / compiled))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,52 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Throughput of run() and every registered fast path, failing loudly if any
+# of them disagree with run().
+#
+#   python benchmarks/differential_bench.py [episodes] [seed]
+
+import sys
+
+from codingerrors.testing import differential, random_episodes
+
+
+def main(n: int = 20000, seed: int = 0):
+    failed = False
+    for type in ("icd10", "opcs4"):
+        report = differential(type, random_episodes(type, n=n, seed=seed))
+        for name, stats in report.items():
+            mismatches = len(stats.get("mismatches", []))
+            failed = failed or mismatches > 0
+            print(
+                "%-6s %-22s %10.0f episodes/s %6i mismatches"
+                % (type, name, stats["episodes_per_second"], mismatches)
+            )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,105 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Reading a synthetic fixed-width extract: line by line with str slicing
+# against the mmap reader, then the mmap reader feeding Engine.check_batch.
+#
+#   python benchmarks/fixed_width_bench.py [megabytes] [path]
+#
+# Use a few thousand megabytes for a multi-GB run. The file is kept and
+# reused if it already has the requested size.
+
+import os
+import sys
+import tempfile
+import time
+
+from codingerrors.compiler import get_engine
+from codingerrors.readers import FixedWidthLayout, read_fixed_width
+from codingerrors.testing import random_episodes
+
+SLOTS = 20
+WIDTH = 6
+LAYOUT = FixedWidthLayout(
+    (0, 12), [(12 + i * WIDTH, WIDTH) for i in range(SLOTS)], 12 + SLOTS * WIDTH + 1
+)
+
+
+def _write(path: str, megabytes: int):
+    episodes = [e[:SLOTS] for e in random_episodes("icd10", n=10000)]
+    records = []
+    for i, codes in enumerate(episodes):
+        slots = "".join(code.ljust(WIDTH) for code in codes).ljust(SLOTS * WIDTH)
+        records.append("%012i%s\n" % (i, slots))
+    block = "".join(records).encode("ascii")
+
+    with open(path, "wb") as f:
+        for _ in range(max(1, megabytes * 1024 * 1024 // len(block))):
+            f.write(block)
+
+
+def _read_lines(path: str):
+    slots = LAYOUT.codes
+    with open(path) as f:
+        for line in f:
+            codes = [line[o : o + w].strip() for o, w in slots]
+            yield line[0:12].strip(), [code for code in codes if code]
+
+
+def _time(label: str, episodes, size: int):
+    start = time.perf_counter()
+    n = 0
+    for _ in episodes:
+        n += 1
+    elapsed = time.perf_counter() - start
+    print(
+        "%-28s %10.0f episodes/s %8.1f MB/s"
+        % (label, n / elapsed, size / elapsed / 1024 / 1024)
+    )
+
+
+def main(megabytes: int = 256, path: str = None):
+    path = path or os.path.join(tempfile.gettempdir(), "codingerrors-fixed-width.dat")
+    megabytes = int(megabytes)
+    if (
+        not os.path.exists(path)
+        or os.path.getsize(path) < megabytes * 1024 * 1024 * 0.9
+    ):
+        _write(path, megabytes)
+    size = os.path.getsize(path)
+    print("%s: %.0f MB" % (path, size / 1024 / 1024))
+
+    _time("readline + slice", _read_lines(path), size)
+    _time("mmap reader", read_fixed_width(path, LAYOUT), size)
+    engine = get_engine("icd10")
+    _time(
+        "mmap reader + check_batch",
+        engine.check_batch(read_fixed_width(path, LAYOUT)),
+        size,
+    )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
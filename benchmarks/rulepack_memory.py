@@ -0,0 +1,101 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Private memory each worker process adds by loading the ICD-10 rules, as
+# the number of workers grows. Linux only (reads /proc/self/smaps_rollup).
+#
+#   python benchmarks/rulepack_memory.py [max workers]
+
+import multiprocessing
+import sys
+
+from codingerrors import run
+from codingerrors.compiler import get_engine
+from codingerrors.rulepack import attach, publish
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+from codingerrors.testing import random_episodes
+
+
+def _private_kib() -> int:
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def _worker(mode: str, segment: str, episodes: list, queue, barrier):
+    before = _private_kib()
+    rule_pack = None
+    if mode == "dict":
+        standards_dict = _build_standards_dict(icd10_standards_dict)
+        check = lambda codes: run(codes, standards_dict=standards_dict)
+    elif mode == "engine":
+        check = get_engine("icd10").check
+    else:
+        rule_pack = attach(segment)
+        check = rule_pack.check
+    for codes in episodes:
+        check(codes)
+    queue.put(_private_kib() - before)
+    # Hold everything alive until all workers have measured.
+    barrier.wait()
+    if rule_pack != None:
+        rule_pack.close()
+
+
+def main(max_workers: int = 8):
+    context = multiprocessing.get_context("spawn")
+    episodes = random_episodes("icd10", n=2000)
+    segment = publish(icd10_standards_dict)
+    try:
+        print("%-8s %8s %22s" % ("mode", "workers", "private KiB / worker"))
+        for mode in ("dict", "engine", "pack"):
+            workers = 1
+            while workers <= max_workers:
+                queue = context.Queue()
+                barrier = context.Barrier(workers)
+                processes = [
+                    context.Process(
+                        target=_worker,
+                        args=(mode, segment.name, episodes, queue, barrier),
+                    )
+                    for _ in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                deltas = [queue.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                print("%-8s %8i %22.0f" % (mode, workers, sum(deltas) / workers))
+                workers *= 2
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -29,6 +29,7 @@ from .check import _check_against_standard
 
 from .utils import chunks
 from .standards import icd10_standards_dict, opcs4_standards_dict
+from .gate import is_clean, first_failure
 
 
 
@@ -0,0 +1,129 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Checking episodes from asyncio sources without blocking the event loop:
+#
+#   async for episode_id, results in check_stream(consumer()):
+#       ...
+#
+# Episodes are batched by count or by time window, each batch is checked on
+# an executor and results are yielded in the order the episodes arrived.
+
+import asyncio
+from collections import deque
+from functools import partial
+
+from .compiler import get_engine
+
+_DONE = object()
+
+
+def _check(type: str, standards: dict, batch: list) -> list:
+    # Runs on the executor; process pool workers compile their own engine.
+    return list(get_engine(type, standards).check_batch(batch, batch_size=len(batch)))
+
+
+async def _read(source, queue: asyncio.Queue):
+    try:
+        async for episode in source:
+            await queue.put(episode)
+    except Exception:
+        await queue.put(_DONE)
+        raise
+    await queue.put(_DONE)
+
+
+async def check_stream(
+    source,
+    type: str = "icd10",
+    standards: dict = None,
+    batch_size: int = 500,
+    window: float = 0.05,
+    max_in_flight: int = 2,
+    executor=None,
+):
+    # source: async iterable of (episode id, codes). A batch is sent once it
+    # has batch_size episodes or window seconds after its first episode,
+    # whichever is first. At most max_in_flight batches are checked at once,
+    # and no more than a batch is read ahead. executor defaults to the loop's
+    # thread pool; standards must be picklable for a process pool.
+    loop = asyncio.get_running_loop()
+    check = partial(_check, type, standards)
+    queue = asyncio.Queue(batch_size)
+    reader = asyncio.ensure_future(_read(source, queue))
+    getter = None
+    in_flight = deque()
+    finished = False
+    batch, deadline = [], None
+
+    try:
+        while True:
+            # Take what has arrived without waiting, up to a full batch.
+            arrived = []
+            if getter != None and getter.done():
+                arrived.append(getter.result())
+                getter = None
+            while len(batch) + len(arrived) < batch_size and not queue.empty():
+                arrived.append(queue.get_nowait())
+            for episode in arrived:
+                if episode is _DONE:
+                    finished = True
+                    # Raises whatever the source raised.
+                    await reader
+                else:
+                    if batch == []:
+                        deadline = loop.time() + window
+                    batch.append(episode)
+
+            if batch and (
+                finished or len(batch) >= batch_size or loop.time() >= deadline
+            ):
+                in_flight.append(loop.run_in_executor(executor, check, batch))
+                batch = []
+                while len(in_flight) >= max_in_flight:
+                    for checked in await in_flight.popleft():
+                        yield checked
+                continue
+
+            while in_flight and in_flight[0].done():
+                for checked in in_flight.popleft().result():
+                    yield checked
+            if finished and not in_flight:
+                return
+
+            # Wait for an episode, the oldest batch or the end of the window.
+            waiting = {in_flight[0]} if in_flight else set()
+            if not finished:
+                if getter == None:
+                    getter = asyncio.ensure_future(queue.get())
+                waiting.add(getter)
+            timeout = max(deadline - loop.time(), 0) if batch else None
+            await asyncio.wait(
+                waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+    finally:
+        for task in (getter, reader):
+            if task != None:
+                task.cancel()
@@ -0,0 +1,126 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Results persisted between runs, keyed by the ruleset they were checked
+# against and a hash of the episode's code sequence. A rerun only has to
+# check episodes that are new or changed, or everything once the rules
+# change.
+
+import hashlib
+import json
+import sqlite3
+
+
+def episode_hash(icd10s: list) -> bytes:
+    return hashlib.blake2b("\x1f".join(icd10s).encode("utf-8"), digest_size=16).digest()
+
+
+class ResultCache:
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # WAL lets worker processes read while one of them writes.
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "ruleset TEXT NOT NULL, episode BLOB NOT NULL, results TEXT NOT NULL, "
+            "PRIMARY KEY (ruleset, episode)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def get_many(self, ruleset_hash: str, episodes: list) -> list:
+        # Cached results in the order given, None where there are none.
+        keys = [episode_hash(icd10s) for icd10s in episodes]
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            found.update(
+                self.connection.execute(
+                    "SELECT episode, results FROM results "
+                    "WHERE ruleset = ? AND episode IN (%s)"
+                    % (",".join("?" * len(chunk))),
+                    [ruleset_hash] + chunk,
+                )
+            )
+
+        results = []
+        for key in keys:
+            if key in found:
+                self.hits += 1
+                results.append({} if found[key] == "{}" else json.loads(found[key]))
+            else:
+                self.misses += 1
+                results.append(None)
+        return results
+
+    def put_many(self, ruleset_hash: str, checked: list):
+        # checked: [(codes, results), ...]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                [
+                    (
+                        ruleset_hash,
+                        episode_hash(icd10s),
+                        json.dumps(results, ensure_ascii=False, separators=(",", ":")),
+                    )
+                    for icd10s, results in checked
+                ],
+            )
+
+    def get(self, ruleset_hash: str, icd10s: list):
+        return self.get_many(ruleset_hash, [icd10s])[0]
+
+    def put(self, ruleset_hash: str, icd10s: list, results: dict):
+        self.put_many(ruleset_hash, [(icd10s, results)])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rulesets": dict(
+                self.connection.execute(
+                    "SELECT ruleset, COUNT(*) FROM results GROUP BY ruleset"
+                )
+            ),
+        }
+
+    def compact(self, keep: list) -> int:
+        # Drops results for every ruleset not in keep and reclaims the space.
+        with self.connection:
+            removed = self.connection.execute(
+                "DELETE FROM results WHERE ruleset NOT IN (%s)"
+                % (",".join("?" * len(keep))),
+                list(keep),
+            ).rowcount
+        self.connection.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self.connection.close()
@@ -45,306 +45,423 @@ def _check_rule_values(values, icd10s):
     return mask_dict
 
 
-def _check_against_standard(returned_standard, icd10s, icd10):
+def _value_present(value, codes, prefixes):
+    # Set based equivalent of `True in truth` from _check_rule_values.
+    if value.endswith("X"):
+        return value[:-1] in codes
+    elif len(value) == 3:
+        return value in prefixes
+    return value in codes
 
-    results = {}
 
-    for standard, rules in returned_standard.items():
-        for rule, values in rules.items():
-            mask_dict = _check_rule_values(values, icd10s)
+def _value_matches(value, code):
+    # _check_rule_values' test of one value against one code.
+    if value.endswith("X"):
+        return code == value[:-1]
+    elif len(value) == 3:
+        return code.startswith(value)
+    return code == value
 
-            if rule == "!":
-                for code, mask in mask_dict.items():
-                    if True in list(itertools.chain(*mask)):
-                        if standard not in results:
-                            results[standard] = {}
+
+def _present_values(values, codes, prefixes):
+    return [v for v in values if _value_present(v, codes, prefixes)]
+
+
+def _value_positions(value, icd10s):
+    if value.endswith("X"):
+        return [i for i, x in enumerate(icd10s) if x == value[:-1]]
+    elif len(value) == 3:
+        return [i for i, x in enumerate(icd10s) if x.startswith(value)]
+    return [i for i, x in enumerate(icd10s) if x == value]
+
+
+def _matched_positions(values, icd10s, codes, prefixes):
+    # Ordered like the keys of _check_rule_values, without building the masks.
+    matched = {}
+    for value in values:
+        if value not in matched and _value_present(value, codes, prefixes):
+            matched[value] = _value_positions(value, icd10s)
+    return matched
+
+
+def _rule_fails(rule, values, icd10s, icd10, codes, prefixes):
+    # Mirrors the failure conditions of _check_rule without building notes.
+    # codes/prefixes are set(icd10s) and {x[:3] for x in icd10s}.
+    if rule == ".":
+        return len(icd10) < int(values)
+    elif rule == "/":
+        return True
+    elif rule == "~":
+        character = int(values["character"])
+        return len(icd10) >= character and icd10[character - 1] == values["have"]
+    elif rule == "&":
+        return icd10 == icd10s[0]
+    elif rule == "^":
+        return not (len(icd10s) == 1 or icd10 in icd10s[0:2])
+    elif rule == "!":
+        return any(_value_present(v, codes, prefixes) for v in values)
+    elif rule == "{":
+        return not any(_value_present(v, codes, prefixes) for v in values)
+
+    if rule not in ("€", "£", "¿", ")", "¬", "$", ">", "<"):
+        return False
+
+    if rule == "<" and "&" in icd10:
+        splits = icd10.split("&")
+        for index, i in enumerate(icd10s):
+            if i == splits[0]:
+                if icd10s[index : len(splits)] == splits:
+                    position = index + len(splits) - 1
+    else:
+        position = icd10s.index(icd10)
+
+    matched = _matched_positions(values, icd10s, codes, prefixes)
+
+    if rule == "€":
+        return matched == {} or any(p[0] + 1 != position for p in matched.values())
+    elif rule == "£":
+        return any(p[0] > position for p in matched.values())
+    elif rule == "¿":
+        return not any(p[0] == position - 1 for p in matched.values())
+    elif rule == ")":
+        return any(p[0] not in (position + 1, position - 1) for p in matched.values())
+    elif rule == "¬":
+        return position == 0 and any(p[0] == 1 for p in matched.values())
+    elif rule == "$":
+        return matched == {} or any(p[0] != position - 1 for p in matched.values())
+    elif rule == ">":
+        return any(p[0] == position + 1 for p in matched.values())
+    # "<": only the first matched value is ever consulted.
+    return matched == {} or position + 1 not in next(iter(matched.values()))
+
+
+def _exclusive(results, standard, code, icd10):
+    # What _check_rule records for a "!" rule whose values are all different:
+    # code is the first match for the last of the values present.
+    results.setdefault(standard, {})["!"] = {
+        "pass": False,
+        "relevant": [code],
+        "note": "You cannot code %s with %s" % (code, icd10),
+    }
+
+
+def _exception_values(returned_standard):
+    # The @ clause in _check_against_standard tests the values of the last
+    # rule evaluated, not the exception codes. Kept as is so every evaluation
+    # path agrees with run().
+    values = []
+    for rules in returned_standard.values():
+        for values in rules.values():
+            pass
+    return list(values)
+
+
+def _check_rule(results, standard, rule, values, icd10s, icd10, present=None):
+    # present, if given, is the subset of values found in icd10s; it yields
+    # the same masks while skipping the scan for everything else.
+    mask_dict = _check_rule_values(values if present == None else present, icd10s)
+
+    if rule == "!":
+        for code, mask in mask_dict.items():
+            if True in list(itertools.chain(*mask)):
+                if standard not in results:
+                    results[standard] = {}
+                rel = [icd10s[x.index(True)] for x in mask]
+                results[standard][rule] = {
+                    "pass": False,
+                    "relevant": rel,
+                    "note": "You cannot code %s with %s"
+                    % ("".join(rel), icd10),
+                }
+
+    elif rule == "€":
+        primary_code_position = icd10s.index(icd10)
+        if True in list(
+            itertools.chain(*list(itertools.chain(*list(mask_dict.values()))))
+        ):
+            for code, mask in mask_dict.items():
+                if True in list(itertools.chain(*mask)):
+                    if primary_code_position != (
+                        list(itertools.chain(*mask)).index(True) + 1
+                    ):
                         rel = [icd10s[x.index(True)] for x in mask]
-                        results[standard][rule] = {
+                        results[standard] = {
                             "pass": False,
-                            "relevant": rel,
-                            "note": "You cannot code %s with %s"
-                            % ("".join(rel), icd10),
+                            "relevant": icd10,
+                            "note": "%s can only exist after %s"
+                            % (icd10, "/".join(rel)),
                         }
+        else:
+            if standard not in results:
+                results[standard] = {}
 
-            elif rule == "€":
-                primary_code_position = icd10s.index(icd10)
-                if True in list(
-                    itertools.chain(*list(itertools.chain(*list(mask_dict.values()))))
-                ):
-                    for code, mask in mask_dict.items():
-                        if True in list(itertools.chain(*mask)):
-                            if primary_code_position != (
-                                list(itertools.chain(*mask)).index(True) + 1
-                            ):
-                                rel = [icd10s[x.index(True)] for x in mask]
-                                results[standard] = {
-                                    "pass": False,
-                                    "relevant": icd10,
-                                    "note": "%s can only exist after %s"
-                                    % (icd10, "/".join(rel)),
-                                }
-                else:
-                    if standard not in results:
-                        results[standard] = {}
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": icd10,
+                "note": "%s cannot exist without one of %s"
+                % (icd10, "/".join(values)),
+            }
 
-                    results[standard][rule] = {
-                        "pass": False,
-                        "relevant": icd10,
-                        "note": "%s cannot exist without one of %s"
-                        % (icd10, "/".join(values)),
-                    }
-            
-            elif rule == "£":
-
-                primary_code_position = icd10s.index(icd10)
-
-                for key, value in mask_dict.items():
-                    for v in value:
-                        if True in v:
-                            pos = v.index(True)
-
-                            if pos > primary_code_position:
-                                if standard not in results:
-                                    results[standard]= {}
-                                results[standard][rule] = {
-                                    "pass": False,
-                                    "relevant": icd10,
-                                    "note": "%s cannot be coded before %s"
-                                    % (icd10, key),
-                                }
-
-                        
-
-            elif rule == "¿":
-                tim = [
-                    True in list(itertools.chain(*_mask))
-                    for k, _mask in mask_dict.items()
-                ]
-                if False not in tim:
-                    # If both are present
-                    proper_pos = False
-                    pos = icd10s.index(icd10)
-
-                    for code, mask in mask_dict.items():
-                        if mask[0].index(True) == (pos - 1):
-                            proper_pos = True
-                    if not proper_pos:
-                        if standard not in results:
-                            results[standard] = {}
-                        rel = list(mask_dict.keys())
+    elif rule == "£":
 
+        primary_code_position = icd10s.index(icd10)
+
+        for key, value in mask_dict.items():
+            for v in value:
+                if True in v:
+                    pos = v.index(True)
+
+                    if pos > primary_code_position:
+                        if standard not in results:
+                            results[standard]= {}
                         results[standard][rule] = {
                             "pass": False,
-                            "relevant": rel,
-                            "note": "%s must be coded after one of %s when %s are all present"
-                            % (icd10, "/".join(rel), "/".join(rel)),
+                            "relevant": icd10,
+                            "note": "%s cannot be coded before %s"
+                            % (icd10, key),
                         }
 
-            elif rule == ")":
-                primary_code_position = icd10s.index(icd10)
 
-                for code, mask in mask_dict.items():
-                    tim = list(itertools.chain(*mask))
-                    if True in tim:
-                        index = tim.index(True)
-                        if index != (primary_code_position + 1) and index != (
-                            primary_code_position - 1
-                        ):
-                            if standard not in results:
-                                results[standard] = {}
-                            rel = [icd10s[x.index(True)] for x in mask]
-                            results[standard][rule] = {
-                                "pass": False,
-                                "relevant": rel,
-                                "note": "%s must be coded before or after %s"
-                                % (icd10, "".join(rel)),
-                            }
 
-            elif rule == "¬":
-                primary_code_position = icd10s.index(icd10)
-
-                if primary_code_position == 0:
-                    for code, mask in mask_dict.items():
-                        tim = list(itertools.chain(*mask))
-                        if True in tim:
-                            index = tim.index(True)
-                            if index == (primary_code_position + 1):
-                                if standard not in results:
-                                    results[standard] = {}
-                                rel = [icd10s[x.index(True)] for x in mask]
-                                results[standard][rule] = {
-                                    "pass": False,
-                                    "relevant": rel,
-                                    "note": "When %s in primary poition it cannot be followed by %s"
-                                    % (icd10, ", ".join(rel)),
-                                }
-            elif rule == "$":
-                position = icd10s.index(icd10)
-
-                if mask_dict == {}:
-                    if standard not in results:
-                        results[standard] = {}
-                    results[standard][rule] = {
-                        "pass": False,
-                        "rel": icd10s,
-                        "note": "%s missing?"
-                        % (" or ".join(returned_standard[standard][rule])),
-                    }
-                else:
-                    for code, mask in mask_dict.items():
-                        _mask = list(itertools.chain(*mask))
-                        if _mask.index(True) != position - 1:
-                            if standard not in results:
-                                results[standard] = {}
+    elif rule == "¿":
+        tim = [
+            True in list(itertools.chain(*_mask))
+            for k, _mask in mask_dict.items()
+        ]
+        if False not in tim:
+            # If both are present
+            proper_pos = False
+            pos = icd10s.index(icd10)
 
-                            rel = [icd10s[x.index(True)] for x in mask]
-
-                            results[standard][rule] = {
-                                "pass": False,
-                                "relevant": rel,
-                                "note": "%s must always follow %s"
-                                % (icd10, " or ".join(rel)),
-                            }
-            elif rule == "{":
-                if mask_dict == {} or True not in list(
-                    itertools.chain(
-                        *[list(itertools.chain(*v)) for v in mask_dict.values()]
-                    )
-                ):
-                    if standard not in results:
-                        results[standard] = {}
-                    results[standard][rule] = {
-                        "pass": False,
-                        "relevant": [icd10],
-                        "note": "None of %s found" % (",".join(values)),
-                    }
-            elif rule == ".":
-                if len(icd10) < int(values):
-                    if standard not in results:
-                        results[standard] = {}
-                    results[standard][rule] = {
-                        "pass": False,
-                        "relevant": [icd10],
-                        "note": "%s needs to have a %i character"
-                        % (icd10, int(values)),
-                    }
-            elif rule == "/":
+            for code, mask in mask_dict.items():
+                if mask[0].index(True) == (pos - 1):
+                    proper_pos = True
+            if not proper_pos:
                 if standard not in results:
                     results[standard] = {}
+                rel = list(mask_dict.keys())
+
                 results[standard][rule] = {
                     "pass": False,
-                    "relevant": [icd10],
-                    "note": "%s cannot be coded" % icd10,
+                    "relevant": rel,
+                    "note": "%s must be coded after one of %s when %s are all present"
+                    % (icd10, "/".join(rel), "/".join(rel)),
                 }
 
-            elif rule == ">":
-                primary_code_position = icd10s.index(icd10)
-                for code, masks in mask_dict.items():
-                    for mask in masks:
-                        if True in mask:
-                            mask_positions = mask.index(True)
-                            if type(mask_positions) == int:
-                                if mask_positions == primary_code_position + 1:
-                                    if standard not in results:
-                                        results[standard] = {}
-                                    results[standard][rule] = {
-                                        "pass": False,
-                                        "relevant": [icd10],
-                                        "note": "%s should not be coded directly after %s"
-                                        % (code, icd10),
-                                    }
-
-            elif rule == "<":
-                error = False
-
-                if "&" in icd10:
-                    splits =  icd10.split("&")
-                    for index, i in enumerate(icd10s):
-                        if i == splits[0]:
-                            if icd10s[index:len(splits)] == splits:
-                                primary_code_position = index+len(splits)-1
-                else:
-                    primary_code_position = icd10s.index(icd10)
-                
-
-                if mask_dict == {}:
-                    error = True
-                for code, masks in mask_dict.items():
-                    for mask in masks:
-                        if True in mask:
-                            mask_positions = [
-                                i for i, x in enumerate(mask) if x == True
-                            ]
-
-                            if primary_code_position + 1 not in mask_positions:
-                                error = True
-                        else:
-                            error = False
-                    if error == False:
-                        break
-
-                if error:
+    elif rule == ")":
+        primary_code_position = icd10s.index(icd10)
+
+        for code, mask in mask_dict.items():
+            tim = list(itertools.chain(*mask))
+            if True in tim:
+                index = tim.index(True)
+                if index != (primary_code_position + 1) and index != (
+                    primary_code_position - 1
+                ):
                     if standard not in results:
                         results[standard] = {}
-                    
-                    if len(values) > 1:
-                        note = "One of %s needs to coded directly after %s" % (",".join(values), icd10)
-                    else:
-                        note = "%s needs to be coded directly after %s" % (values[0], icd10)
-                    
+                    rel = [icd10s[x.index(True)] for x in mask]
                     results[standard][rule] = {
                         "pass": False,
-                        "relevant": [icd10],
-                        "note": note
+                        "relevant": rel,
+                        "note": "%s must be coded before or after %s"
+                        % (icd10, "".join(rel)),
                     }
 
-            elif rule == "~":
-                character = int(values["character"])
-                have = values["have"]
-                passes = True
-                if len(icd10) >= character:
-                    if icd10[character - 1] == have:
-                        passes = False
+    elif rule == "¬":
+        primary_code_position = icd10s.index(icd10)
 
-                if not passes:
+        if primary_code_position == 0:
+            for code, mask in mask_dict.items():
+                tim = list(itertools.chain(*mask))
+                if True in tim:
+                    index = tim.index(True)
+                    if index == (primary_code_position + 1):
+                        if standard not in results:
+                            results[standard] = {}
+                        rel = [icd10s[x.index(True)] for x in mask]
+                        results[standard][rule] = {
+                            "pass": False,
+                            "relevant": rel,
+                            "note": "When %s in primary poition it cannot be followed by %s"
+                            % (icd10, ", ".join(rel)),
+                        }
+    elif rule == "$":
+        position = icd10s.index(icd10)
+
+        if mask_dict == {}:
+            if standard not in results:
+                results[standard] = {}
+            results[standard][rule] = {
+                "pass": False,
+                "rel": icd10s,
+                "note": "%s missing?"
+                % (" or ".join(values)),
+            }
+        else:
+            for code, mask in mask_dict.items():
+                _mask = list(itertools.chain(*mask))
+                if _mask.index(True) != position - 1:
                     if standard not in results:
                         results[standard] = {}
 
-                    results[standard][rule] = {
-                        "pass": False,
-                        "relevant": [icd10],
-                        "note": "%s has %s in the %i position"
-                        % (icd10, have, character),
-                    }
+                    rel = [icd10s[x.index(True)] for x in mask]
 
-            elif rule == "&":
-                if icd10 == icd10s[0]:
-                    if standard not in results:
-                        results[standard] = {}
                     results[standard][rule] = {
                         "pass": False,
-                        "relevant": [icd10],
-                        "note": "%s cannot be in primary position!" % (icd10),
+                        "relevant": rel,
+                        "note": "%s must always follow %s"
+                        % (icd10, " or ".join(rel)),
                     }
-            elif rule == "^":
-                rule_pass = False
+    elif rule == "{":
+        if mask_dict == {} or True not in list(
+            itertools.chain(
+                *[list(itertools.chain(*v)) for v in mask_dict.values()]
+            )
+        ):
+            if standard not in results:
+                results[standard] = {}
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": [icd10],
+                "note": "None of %s found" % (",".join(values)),
+            }
+    elif rule == ".":
+        if len(icd10) < int(values):
+            if standard not in results:
+                results[standard] = {}
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": [icd10],
+                "note": "%s needs to have a %i character"
+                % (icd10, int(values)),
+            }
+    elif rule == "/":
+        if standard not in results:
+            results[standard] = {}
+        results[standard][rule] = {
+            "pass": False,
+            "relevant": [icd10],
+            "note": "%s cannot be coded" % icd10,
+        }
+
+    elif rule == ">":
+        primary_code_position = icd10s.index(icd10)
+        for code, masks in mask_dict.items():
+            for mask in masks:
+                if True in mask:
+                    mask_positions = mask.index(True)
+                    if type(mask_positions) == int:
+                        if mask_positions == primary_code_position + 1:
+                            if standard not in results:
+                                results[standard] = {}
+                            results[standard][rule] = {
+                                "pass": False,
+                                "relevant": [icd10],
+                                "note": "%s should not be coded directly after %s"
+                                % (code, icd10),
+                            }
 
-                if len(icd10s) == 1:
-                    rule_pass = True
+    elif rule == "<":
+        error = False
 
-                elif icd10 in icd10s[0:2]:
-                    rule_pass = True
+        if "&" in icd10:
+            splits =  icd10.split("&")
+            for index, i in enumerate(icd10s):
+                if i == splits[0]:
+                    if icd10s[index:len(splits)] == splits:
+                        primary_code_position = index+len(splits)-1
+        else:
+            primary_code_position = icd10s.index(icd10)
 
-                if not rule_pass:
-                    if standard not in results:
-                        results[standard] = {}
 
-                        results[standard][rule] = {
-                            "pass": False,
-                            "relevant": [icd10],
-                            "note": "%s must be in primary or secondary position!"
-                            % (icd10),
-                        }
+        if mask_dict == {}:
+            error = True
+        for code, masks in mask_dict.items():
+            for mask in masks:
+                if True in mask:
+                    mask_positions = [
+                        i for i, x in enumerate(mask) if x == True
+                    ]
+
+                    if primary_code_position + 1 not in mask_positions:
+                        error = True
+                else:
+                    error = False
+            if error == False:
+                break
+
+        if error:
+            if standard not in results:
+                results[standard] = {}
+
+            if len(values) > 1:
+                note = "One of %s needs to coded directly after %s" % (",".join(values), icd10)
+            else:
+                note = "%s needs to be coded directly after %s" % (values[0], icd10)
+
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": [icd10],
+                "note": note
+            }
+
+    elif rule == "~":
+        character = int(values["character"])
+        have = values["have"]
+        passes = True
+        if len(icd10) >= character:
+            if icd10[character - 1] == have:
+                passes = False
+
+        if not passes:
+            if standard not in results:
+                results[standard] = {}
+
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": [icd10],
+                "note": "%s has %s in the %i position"
+                % (icd10, have, character),
+            }
+
+    elif rule == "&":
+        if icd10 == icd10s[0]:
+            if standard not in results:
+                results[standard] = {}
+            results[standard][rule] = {
+                "pass": False,
+                "relevant": [icd10],
+                "note": "%s cannot be in primary position!" % (icd10),
+            }
+    elif rule == "^":
+        rule_pass = False
+
+        if len(icd10s) == 1:
+            rule_pass = True
+
+        elif icd10 in icd10s[0:2]:
+            rule_pass = True
+
+        if not rule_pass:
+            if standard not in results:
+                results[standard] = {}
+
+                results[standard][rule] = {
+                    "pass": False,
+                    "relevant": [icd10],
+                    "note": "%s must be in primary or secondary position!"
+                    % (icd10),
+                }
+
+
+def _check_against_standard(returned_standard, icd10s, icd10):
+
+    results = {}
+
+    for standard, rules in returned_standard.items():
+        for rule, values in rules.items():
+            _check_rule(results, standard, rule, values, icd10s, icd10)
 
     # Exception clauses (@)
     for standard, rules in returned_standard.items():
@@ -0,0 +1,162 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Resumable output for long runs. Results go to numbered part files next to
+# the output. Every `every` input records the current part is renamed into
+# place and the checkpoint, holding the input offset, the counts so far and
+# the committed parts, is replaced after it. A part is only committed once
+# the checkpoint naming it is on disk, so a resumed run rewrites whatever
+# came after the last checkpoint and every result is written exactly once.
+
+import glob
+import json
+import os
+import shutil
+
+CHECKPOINT_EVERY = 100000
+
+
+def _replace(path: str, text: str):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class Checkpoint:
+    def __init__(self, output_path: str, every: int = CHECKPOINT_EVERY, input=None):
+        # input is the input file's path, so a checkpoint is not resumed
+        # against a different file.
+        self.output_path = output_path
+        self.path = output_path + ".checkpoint"
+        self.every = every
+        self.input = None
+        if input != None:
+            self.input = {
+                "path": os.path.abspath(input),
+                "size": os.path.getsize(input),
+            }
+        self.record = 0
+        self.episodes = 0
+        self.counts = {}
+        self.parts = []
+        self._file = None
+
+    def _part(self, index: int) -> str:
+        return "%s.part-%05i" % (self.output_path, index)
+
+    def resume(self) -> bool:
+        # Picks up from the last checkpoint, if there is one, and removes
+        # any part written after it. Returns whether there was one.
+        if not os.path.exists(self.path):
+            self.reset()
+            return False
+        with open(self.path) as file:
+            state = json.load(file)
+        if self.input != None and state["input"] != self.input:
+            raise ValueError(
+                "%s is a checkpoint for %s, not %s"
+                % (self.path, state["input"], self.input)
+            )
+        self.record = state["record"]
+        self.episodes = state["episodes"]
+        self.counts = state["counts"]
+        self.parts = state["parts"]
+        self._clean(self.parts)
+        return True
+
+    def reset(self):
+        # Starts over, removing any earlier checkpoint and its parts.
+        self._clean([])
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.record, self.episodes, self.counts, self.parts = 0, 0, {}, []
+
+    def _clean(self, keep: list):
+        for path in glob.glob(glob.escape(self.output_path) + ".part-*"):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+    def write(self, text: str):
+        if self._file == None:
+            path = self._part(len(self.parts))
+            self._file = open(path + ".tmp", "w")
+        self._file.write(text)
+
+    def due(self, record: int) -> bool:
+        return record - self.record >= self.every
+
+    def commit(self, record: int, episodes: int, counts: dict):
+        # record is the input offset everything before has been written for.
+        if self._file != None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            path = self._part(len(self.parts))
+            os.replace(path + ".tmp", path)
+            self.parts.append(os.path.basename(path))
+        self.record, self.episodes, self.counts = record, episodes, dict(counts)
+        _replace(
+            self.path,
+            json.dumps(
+                {
+                    "input": self.input,
+                    "record": self.record,
+                    "episodes": self.episodes,
+                    "counts": self.counts,
+                    "parts": self.parts,
+                }
+            ),
+        )
+
+    def close(self):
+        # Drops an uncommitted part, e.g. after a failed run.
+        if self._file != None:
+            self._file.close()
+            os.remove(self._file.name)
+            self._file = None
+
+    def finish(self):
+        # Joins the committed parts into the output and removes them and
+        # the checkpoint. Until the checkpoint is gone its parts are still
+        # there to join again.
+        directory = os.path.dirname(self.output_path)
+        paths = [os.path.join(directory, part) for part in self.parts]
+        if len(paths) == 1:
+            os.remove(self.path)
+            os.replace(paths[0], self.output_path)
+            return
+        with open(self.output_path + ".tmp", "wb") as output:
+            for path in paths:
+                with open(path, "rb") as part:
+                    shutil.copyfileobj(part, output, 1 << 20)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(self.output_path + ".tmp", self.output_path)
+        os.remove(self.path)
+        self._clean([])
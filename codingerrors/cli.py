@@ -0,0 +1,287 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import argparse
+import json
+import os
+import sys
+from contextlib import ExitStack, nullcontext
+
+from . import shards
+from .cache import ResultCache
+from .checkpoint import CHECKPOINT_EVERY, Checkpoint
+from .compiler import get_engine
+from .daemon import Daemon
+from .metrics import JsonLines, Metrics, PrometheusFile, Reporter, serve_metrics
+from .overlays import Overlay
+from .pipeline import Pipeline
+from .profiling import MODES, profiled
+from .profiles import PROFILES, get_profile
+from .readers import FixedWidthLayout, read_fixed_width
+from .shards import Manifest
+
+
+def _reporter(args):
+    # A Reporter for the --metrics-* arguments, or None without any.
+    sinks = []
+    if args.metrics_file != None:
+        sinks.append(PrometheusFile(args.metrics_file))
+    if args.metrics_jsonl != None:
+        sinks.append(JsonLines(args.metrics_jsonl))
+    if not sinks and getattr(args, "metrics_port", None) == None:
+        return None
+    return Reporter(Metrics(), sinks, args.metrics_interval)
+
+
+def _check(args) -> int:
+    pipeline = Pipeline(
+        type=args.type,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        shared_rules=args.shared_rules,
+        cache=args.cache,
+        max_codes=args.max_codes,
+    )
+    if args.overlay != None:
+        pipeline.standards = Overlay.from_json(args.overlay).merged(args.type)
+    if args.profile != None:
+        profile = get_profile(args.profile)
+        if pipeline.standards != None:
+            pipeline.standards = profile.apply(pipeline.standards)
+        else:
+            pipeline.standards = profile.merged(args.type)
+    reporter = _reporter(args)
+    if reporter != None:
+        pipeline.metrics = reporter.metrics
+    checkpoint = None
+    if args.checkpoint_every != None or args.resume:
+        checkpoint = Checkpoint(
+            args.output, args.checkpoint_every or CHECKPOINT_EVERY, args.input
+        )
+        if args.resume:
+            checkpoint.resume()
+        else:
+            checkpoint.reset()
+    context = nullcontext()
+    if args.profile_output != None:
+        # Pool workers are other processes, out of the profiler's sight.
+        if args.workers == None:
+            pipeline.workers = 0
+        context = profiled(args.profile_output, args.profile_mode)
+    manifest = None
+    if args.manifest != None:
+        manifest = Manifest.from_json(args.manifest)
+        manifest.check_input(args.input)
+    with reporter or nullcontext(), context, ExitStack() as files:
+        if args.layout != None:
+            pipeline.parse = None
+            layout = FixedWidthLayout.from_json(args.layout)
+            source = read_fixed_width(args.input, layout)
+        else:
+            source = files.enter_context(open(args.input, newline=""))
+        if manifest != None:
+            source = manifest.select(source, None if args.layout != None else "")
+        if checkpoint != None:
+            stats = pipeline.run(source, None, checkpoint)
+        else:
+            output = files.enter_context(open(args.output, "w"))
+            stats = pipeline.run(source, output)
+    if args.stats:
+        json.dump(stats, sys.stderr, indent=2)
+        sys.stderr.write("\n")
+    return 0
+
+
+def _cache(args) -> int:
+    cache = ResultCache(args.path)
+    try:
+        if args.action == "compact":
+            # By default keep results for the rules this version ships with.
+            keep = args.keep or [
+                get_engine(type).ruleset_hash for type in ("icd10", "opcs4")
+            ]
+            json.dump({"removed": cache.compact(keep)}, sys.stdout)
+        else:
+            json.dump(cache.stats()["rulesets"], sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    finally:
+        cache.close()
+    return 0
+
+
+def _shard(args) -> int:
+    os.makedirs(args.directory, exist_ok=True)
+    for path in shards.shard(args.input, args.shards, args.directory):
+        print(path)
+    return 0
+
+
+def _merge(args) -> int:
+    shards.merge(args.results, args.output, args.counts)
+    return 0
+
+
+def _daemon(args) -> int:
+    reporter = _reporter(args)
+    metrics = reporter.metrics if reporter != None else None
+    daemon = Daemon(args.socket, args.types, int(args.mode, 8), metrics, args.max_codes)
+    if args.metrics_port != None:
+        serve_metrics(metrics, args.metrics_port)
+    try:
+        with reporter or nullcontext():
+            daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _metrics_arguments(parser):
+    parser.add_argument(
+        "--metrics-file", help="write Prometheus text metrics to this file"
+    )
+    parser.add_argument("--metrics-jsonl", help="append JSON lines of metrics")
+    parser.add_argument(
+        "--metrics-interval", type=float, default=10.0, help="seconds between reports"
+    )
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="codingerrors")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check = commands.add_parser(
+        "check", help="check a CSV of episodes (id,code,code,...) into JSON lines"
+    )
+    check.add_argument("input")
+    check.add_argument("output")
+    check.add_argument("--type", default="icd10", choices=["icd10", "opcs4"])
+    check.add_argument(
+        "--layout", help="JSON fixed-width layout; input is read as fixed-width"
+    )
+    check.add_argument(
+        "--workers", type=int, default=None, help="check processes, 0 for none"
+    )
+    check.add_argument("--batch-size", type=int, default=500)
+    check.add_argument("--queue-size", type=int, default=8)
+    check.add_argument(
+        "--shared-rules",
+        action="store_true",
+        help="share one rule pack between workers instead of compiling per worker",
+    )
+    check.add_argument(
+        "--cache", help="result cache database; unchanged episodes are not rechecked"
+    )
+    check.add_argument(
+        "--max-codes",
+        type=int,
+        help="flag episodes with more codes than this instead of checking them",
+    )
+    check.add_argument(
+        "--checkpoint-every",
+        type=int,
+        help="checkpoint every this many input records (default %i with --resume)"
+        % CHECKPOINT_EVERY,
+    )
+    check.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the last checkpoint of an interrupted run",
+    )
+    check.add_argument(
+        "--manifest", help="only check the records in this shard manifest (see shard)"
+    )
+    check.add_argument(
+        "--overlay", help="JSON overlay of local rules to merge with the national set"
+    )
+    check.add_argument(
+        "--profile",
+        help="only check a subset of the rules: %s, or a JSON profile"
+        % (", ".join(PROFILES)),
+    )
+    check.add_argument(
+        "--profile-output",
+        help="profile the run into PROFILE_OUTPUT.folded (and .pstats); "
+        "checks run in process unless --workers is given",
+    )
+    check.add_argument(
+        "--profile-mode",
+        default="cprofile",
+        choices=MODES,
+        help="sample for long runs, where cProfile would slow them down",
+    )
+    check.add_argument(
+        "--stats", action="store_true", help="print per-stage stats to stderr"
+    )
+    _metrics_arguments(check)
+    check.set_defaults(func=_check)
+
+    shard = commands.add_parser(
+        "shard", help="split a check into manifests by a hash of the episode ids"
+    )
+    shard.add_argument("input")
+    shard.add_argument("shards", type=int)
+    shard.add_argument("directory", help="where to write shard-NNNNN.json")
+    shard.set_defaults(func=_shard)
+
+    merge = commands.add_parser(
+        "merge", help="merge sharded check results into one file, in record order"
+    )
+    merge.add_argument("output")
+    merge.add_argument("results", nargs="+")
+    merge.add_argument("--counts", help="write episode and failure totals as JSON")
+    merge.set_defaults(func=_merge)
+
+    cache = commands.add_parser("cache", help="inspect or compact a result cache")
+    cache.add_argument("action", choices=["stats", "compact"])
+    cache.add_argument("path")
+    cache.add_argument(
+        "--keep",
+        action="append",
+        help="ruleset hash to keep when compacting (default: the built-in rules)",
+    )
+    cache.set_defaults(func=_cache)
+
+    daemon = commands.add_parser(
+        "daemon", help="serve compiled engines on a Unix socket (see daemon.Client)"
+    )
+    daemon.add_argument("socket")
+    daemon.add_argument(
+        "--types", nargs="+", default=["icd10", "opcs4"], choices=["icd10", "opcs4"]
+    )
+    daemon.add_argument("--mode", default="600", help="socket file mode, in octal")
+    daemon.add_argument(
+        "--max-codes",
+        type=int,
+        help="flag episodes with more codes than this instead of checking them",
+    )
+    _metrics_arguments(daemon)
+    daemon.add_argument(
+        "--metrics-port", type=int, help="serve Prometheus metrics on localhost"
+    )
+    daemon.set_defaults(func=_daemon)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
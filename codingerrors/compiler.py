@@ -0,0 +1,492 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import hashlib
+import json
+
+from .check import _check_rule, _exception_values, _exclusive, _present_values
+from .check import _value_matches
+from .gate import _build_gate_plan, _first_failure
+from .standards import _build_standards_dict, _standards_for
+from .standards import icd10_standards_dict, opcs4_standards_dict
+from .utils import chunk_keys, too_many_codes
+
+# Rules that can only fail when one of their values is in the episode.
+_NEEDS_PRESENT = ("!", "£", ")", ">")
+# Rules that can only fail when none of their values are in the episode.
+_NEEDS_ABSENT = ("{",)
+# Rules that depend on positions, always handed to _check_rule.
+_POSITIONAL = ("€", "¿", "¬", "$", "<")
+
+_ENGINES = {}
+
+
+def ruleset_hash(standards: dict) -> str:
+    # Order matters to run(), so it is part of the hash.
+    return hashlib.sha256(
+        json.dumps(list(standards.items()), ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class _Source:
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.indent = 0
+
+    def constant(self, value) -> str:
+        if isinstance(value, frozenset):
+            literal = "frozenset(%r)" % (sorted(value))
+        else:
+            literal = repr(value)
+        if literal not in self.constants:
+            self.constants[literal] = "_c%i" % (len(self.constants))
+        return self.constants[literal]
+
+    def emit(self, indent: int, line: str):
+        self.lines.append("    " * (self.indent + indent) + line)
+
+    def present(self, values) -> str:
+        # Inlined equivalent of _value_present for any of the values.
+        codes, prefixes = [], []
+        for value in values:
+            if value.endswith("X"):
+                codes.append(value[:-1])
+            elif len(value) == 3:
+                prefixes.append(value)
+            else:
+                codes.append(value)
+
+        tests = []
+        for name, group in (("codes", codes), ("prefixes.keys()", prefixes)):
+            group = list(dict.fromkeys(group))
+            if len(group) > 3:
+                tests.append(
+                    "not %s.isdisjoint(%s)" % (name, self.constant(frozenset(group)))
+                )
+            else:
+                tests.extend("%r in %s" % (value, name) for value in group)
+        return " or ".join(tests) or "False"
+
+    def matches(self, code: str, values) -> str:
+        # Inlined test of whether the code expression matches any of values.
+        codes, prefixes = set(), set()
+        for value in values:
+            if value.endswith("X"):
+                codes.add(value[:-1])
+            elif len(value) == 3:
+                prefixes.add(value)
+            else:
+                codes.add(value)
+        tests = []
+        if codes:
+            tests.append("%s in %s" % (code, self.constant(frozenset(codes))))
+        if prefixes:
+            tests.append("%s[0:3] in %s" % (code, self.constant(frozenset(prefixes))))
+        return "(%s)" % (" or ".join(tests) or "False")
+
+
+def _emit_rule(
+    source: _Source,
+    standard: str,
+    rule: str,
+    values,
+    combination: bool,
+    exclusive: bool = False,
+):
+    key = repr(standard)
+    constant = source.constant(values)
+    call = "_check_rule(results, %s, %r, %s, icd10s, icd10, %s)" % (
+        key,
+        rule,
+        constant,
+        "_present_values(%s, codes, prefixes)" % (constant),
+    )
+
+    distinct = rule == "!" and not combination and len(set(values)) == len(values)
+    if distinct:
+        # No masks: the last value present decides the note, so test them in
+        # reverse. Inside an exclusion group the group's test guards them.
+        if not exclusive:
+            source.emit(1, "if %s:" % (source.present(values)))
+            source.indent += 1
+        for index, value in enumerate(reversed(values)):
+            if value.endswith("X"):
+                test, code = "%r in codes" % (value[:-1]), repr(value[:-1])
+            elif len(value) == 3:
+                test, code = "%r in prefixes" % (value), "prefixes[%r]" % (value)
+            else:
+                test, code = "%r in codes" % (value), repr(value)
+            source.emit(1, "%s %s:" % ("if" if index == 0 else "elif", test))
+            source.emit(2, "_exclusive(results, %s, %s, icd10)" % (key, code))
+        if not exclusive:
+            source.indent -= 1
+    elif combination and rule in _NEEDS_PRESENT + _NEEDS_ABSENT + _POSITIONAL:
+        # icd10 is an A&B key; leave every positional quirk to _check_rule.
+        source.emit(1, call)
+    elif rule == ">":
+        # Only fails when the code after icd10 is one of the values.
+        source.emit(1, "position = icd10s.index(icd10) + 1")
+        source.emit(
+            1,
+            "if position < len(icd10s) and %s:"
+            % (source.matches("icd10s[position]", values)),
+        )
+        source.emit(2, call)
+    elif rule == "¬":
+        # Only fails for a primary icd10 followed by one of the values.
+        source.emit(
+            1,
+            "if icd10 == icd10s[0] and len(icd10s) > 1 and %s:"
+            % (source.matches("icd10s[1]", values)),
+        )
+        source.emit(2, call)
+    elif rule == "<":
+        # Passes only when the code after icd10 matches the first value
+        # present.
+        source.emit(1, "position = icd10s.index(icd10) + 1")
+        source.emit(1, "present = _present_values(%s, codes, prefixes)" % (constant))
+        source.emit(
+            1,
+            "if not (present and position < len(icd10s) and "
+            "_value_matches(present[0], icd10s[position])):",
+        )
+        if len(values) > 1:
+            note = "One of %s needs to coded directly after %%s" % (",".join(values))
+        else:
+            note = "%s needs to be coded directly after %%s" % (values[0])
+        source.emit(2, "results.setdefault(%s, {})[%r] = {" % (key, rule))
+        source.emit(3, "'pass': False,")
+        source.emit(3, "'relevant': [icd10],")
+        source.emit(3, "'note': %r %% icd10," % (note))
+        source.emit(2, "}")
+    elif rule in _NEEDS_PRESENT:
+        source.emit(1, "if %s:" % (source.present(values)))
+        source.emit(2, call)
+    elif rule in _NEEDS_ABSENT:
+        source.emit(1, "if not (%s):" % (source.present(values)))
+        source.emit(2, call)
+    elif rule in _POSITIONAL:
+        source.emit(1, call)
+    elif rule == ".":
+        source.emit(1, "if len(icd10) < %i:" % (int(values)))
+        source.emit(2, "results.setdefault(%s, {})[%r] = {" % (key, rule))
+        source.emit(3, "'pass': False,")
+        source.emit(3, "'relevant': [icd10],")
+        note = "%%s needs to have a %i character" % (int(values))
+        source.emit(3, "'note': %r %% icd10," % (note))
+        source.emit(2, "}")
+    elif rule == "/":
+        source.emit(1, "results.setdefault(%s, {})[%r] = {" % (key, rule))
+        source.emit(2, "'pass': False,")
+        source.emit(2, "'relevant': [icd10],")
+        source.emit(2, "'note': '%s cannot be coded' % icd10,")
+        source.emit(1, "}")
+    elif rule == "~":
+        character = int(values["character"])
+        have = values["have"]
+        source.emit(
+            1,
+            "if len(icd10) >= %i and icd10[%i] == %r:"
+            % (character, character - 1, have),
+        )
+        source.emit(2, "results.setdefault(%s, {})[%r] = {" % (key, rule))
+        source.emit(3, "'pass': False,")
+        source.emit(3, "'relevant': [icd10],")
+        note = "%%s has %s in the %i position" % (have, character)
+        source.emit(3, "'note': %r %% icd10," % (note))
+        source.emit(2, "}")
+    elif rule == "&":
+        source.emit(1, "if icd10 == icd10s[0]:")
+        source.emit(2, "results.setdefault(%s, {})[%r] = {" % (key, rule))
+        source.emit(3, "'pass': False,")
+        source.emit(3, "'relevant': [icd10],")
+        source.emit(3, "'note': '%s cannot be in primary position!' % icd10,")
+        source.emit(2, "}")
+    elif rule == "^":
+        # Only recorded when nothing else has failed for the standard yet.
+        source.emit(
+            1,
+            "if not (len(icd10s) == 1 or icd10 in icd10s[0:2]) and %s not in results:"
+            % (key),
+        )
+        source.emit(2, "results[%s] = {%r: {" % (key, rule))
+        source.emit(3, "'pass': False,")
+        source.emit(3, "'relevant': [icd10],")
+        source.emit(
+            3, "'note': '%s must be in primary or secondary position!' % icd10,"
+        )
+        source.emit(2, "}}")
+
+
+def _exclusion_groups(returned_standard: dict) -> list:
+    # Families like DCS.XIV.2 (N181-N189) spell "at most one of" as a
+    # standard per code with only a ! rule, so each code's trigger holds one
+    # for every other member. Consecutive standards like that are grouped so
+    # a single test of all their values can skip the lot.
+    groups = []
+    for standard, rules in returned_standard.items():
+        exclusive = list(rules) == ["!"] and len(set(rules["!"])) == len(rules["!"])
+        if exclusive and groups and groups[-1][0]:
+            groups[-1][1].append(standard)
+        else:
+            groups.append((exclusive, [standard]))
+    return [standards for _, standards in groups]
+
+
+def _emit_trigger(source: _Source, name: str, trigger: str, returned_standard: dict):
+    # The function body depends only on returned_standard and whether
+    # trigger is a combination.
+    combination = "&" in trigger
+    source.emit(0, "def %s(icd10s, icd10, codes, prefixes):" % (name))
+    source.emit(1, "# %s" % (trigger))
+    source.emit(1, "results = {}")
+    for group in _exclusion_groups(returned_standard):
+        grouped = len(group) > 1 and not combination
+        if grouped:
+            values = [v for s in group for v in returned_standard[s]["!"]]
+            source.emit(1, "# %s" % (", ".join(group)))
+            source.emit(1, "if %s:" % (source.present(values)))
+            source.indent += 1
+        for standard in group:
+            for rule, values in returned_standard[standard].items():
+                _emit_rule(source, standard, rule, values, combination, grouped)
+        source.indent = 0
+
+    exception_values = _exception_values(returned_standard)
+    for standard, rules in returned_standard.items():
+        if "@" in rules:
+            source.emit(
+                1,
+                "if %r in results and (%s):"
+                % (standard, source.present(exception_values)),
+            )
+            source.emit(2, "del results[%r]" % (standard))
+    source.emit(1, "return results")
+    source.emit(0, "")
+
+
+def _emit_check(source: _Source, name: str, table: str, triggers: dict):
+    # A run() equivalent called name, looking triggers up in a dict called
+    # table built from triggers ({trigger: function name}). Lookups that no
+    # trigger can answer are left out, and an episode whose codes and
+    # prefixes reach no trigger returns before the loop.
+    sizes = {t.count("&") + 1 for t in triggers if "&" in t}
+    reachable = set()
+    for trigger in triggers:
+        reachable.add(trigger)
+        reachable.update(trigger.split("&"))
+        if len(trigger) == 4 and trigger.endswith("X"):
+            reachable.add(trigger[:3])
+    x_keys = any(len(t) == 4 and t.endswith("X") for t in triggers)
+    three = any(len(t) == 3 for t in triggers)
+    source.emit(0, "%s = {" % (table))
+    for trigger, function in triggers.items():
+        source.emit(1, "%r: %s," % (trigger, function))
+    source.emit(0, "}")
+    source.emit(0, "")
+    source.emit(0, "def %s(icd10s):" % (name))
+    source.emit(1, "final_results = {}")
+    source.emit(1, "codes = set(icd10s)")
+    # The first code with each prefix, for notes naming a prefix's match.
+    source.emit(1, "prefixes = {x[0:3]: x for x in reversed(icd10s)}")
+    reachable = source.constant(frozenset(reachable))
+    source.emit(
+        1,
+        "if %s.isdisjoint(codes) and %s.isdisjoint(prefixes):" % (reachable, reachable),
+    )
+    source.emit(2, "return final_results")
+    source.emit(1, "for icd10 in icd10s:")
+    source.emit(2, "if icd10 not in final_results:")
+    source.emit(3, "final_results[icd10] = {}")
+    if x_keys:
+        source.emit(2, "if len(icd10) == 3:")
+        source.emit(3, "f = %s.get(icd10 + 'X')" % (table))
+        source.emit(3, "if f is not None:")
+        source.emit(4, "final_results[icd10] = f(icd10s, icd10, codes, prefixes)")
+    source.emit(2, "f = %s.get(icd10)" % (table))
+    source.emit(2, "if f is not None:")
+    source.emit(3, "final_results[icd10].update(f(icd10s, icd10, codes, prefixes))")
+    if three:
+        source.emit(2, "if len(icd10) > 3:")
+        source.emit(3, "f = %s.get(icd10[0:3])" % (table))
+        source.emit(3, "if f is not None:")
+        source.emit(4, "final_results[icd10].update(f(icd10s, icd10, codes, prefixes))")
+    if sizes:
+        source.emit(1, "for key in chunk_keys(icd10s, %r):" % (sizes))
+        source.emit(2, "f = %s.get(key)" % (table))
+        source.emit(2, "if f is not None:")
+        source.emit(
+            3,
+            "final_results.setdefault(key, {}).update(f(icd10s, key, codes, prefixes))",
+        )
+    source.emit(1, "return {k: v for k, v in final_results.items() if v != {}}")
+
+
+def _module_source(source: _Source) -> str:
+    header = ["%s = %s" % (name, literal) for literal, name in source.constants.items()]
+    return "\n".join(header + [""] + source.lines) + "\n"
+
+
+def _compile_source(text: str, name: str) -> dict:
+    namespace = {
+        "_check_rule": _check_rule,
+        "_exclusive": _exclusive,
+        "_present_values": _present_values,
+        "_value_matches": _value_matches,
+        "chunk_keys": chunk_keys,
+    }
+    exec(compile(text, "<codingerrors %s>" % (name), "exec"), namespace)
+    return namespace
+
+
+def _generate_source(standards_dict: dict) -> str:
+    source = _Source()
+    triggers = {}
+    for index, (trigger, returned_standard) in enumerate(standards_dict.items()):
+        triggers[trigger] = "_t%i" % (index)
+        _emit_trigger(source, triggers[trigger], trigger, returned_standard)
+    _emit_check(source, "check", "_triggers", triggers)
+    return _module_source(source)
+
+
+def check_batch(
+    checker,
+    episodes,
+    cache=None,
+    batch_size: int = 500,
+    stats: dict = None,
+    max_codes: int = None,
+):
+    # episodes: iterable of (episode id, codes). Yields (episode id, results).
+    # checker is anything with check() and ruleset_hash (Engine, RulePack).
+    # Each distinct code sequence in a batch is checked once and its results
+    # shared by every episode with it, so they must not be modified. stats,
+    # if given, counts "episodes" and "distinct" sequences checked. Episodes
+    # with more than max_codes codes are not checked; they get
+    # utils.too_many_codes() and are counted as "limited".
+    batch = []
+    for episode in episodes:
+        if max_codes != None and len(episode[1]) > max_codes:
+            if batch:
+                yield from _check_distinct(checker, batch, cache, stats)
+                batch = []
+            if stats != None:
+                stats["limited"] = stats.get("limited", 0) + 1
+            yield episode[0], too_many_codes(len(episode[1]), max_codes)
+            continue
+        batch.append(episode)
+        if len(batch) == batch_size:
+            yield from _check_distinct(checker, batch, cache, stats)
+            batch = []
+    if batch:
+        yield from _check_distinct(checker, batch, cache, stats)
+
+
+def _check_distinct(checker, batch: list, cache, stats: dict) -> list:
+    found = {}
+    if cache == None:
+        check = checker.check
+        checked = []
+        for episode_id, icd10s in batch:
+            key = tuple(icd10s)
+            results = found.get(key)
+            if results is None:
+                results = found[key] = check(icd10s)
+            checked.append((episode_id, results))
+    else:
+        keys = [tuple(icd10s) for _, icd10s in batch]
+        for key, (_, icd10s) in zip(keys, batch):
+            if key not in found:
+                found[key] = icd10s
+        found = dict(zip(found, _check_cached(checker, list(found.values()), cache)))
+        checked = [
+            (episode_id, found[key]) for key, (episode_id, _) in zip(keys, batch)
+        ]
+
+    if stats != None:
+        stats["episodes"] = stats.get("episodes", 0) + len(batch)
+        stats["distinct"] = stats.get("distinct", 0) + len(found)
+    return checked
+
+
+def _check_cached(checker, episodes: list, cache) -> list:
+    found = cache.get_many(checker.ruleset_hash, episodes)
+    checked = []
+    for i, icd10s in enumerate(episodes):
+        if found[i] == None:
+            found[i] = checker.check(icd10s)
+            checked.append((icd10s, found[i]))
+    if checked:
+        cache.put_many(checker.ruleset_hash, checked)
+    return found
+
+
+class Engine:
+    # A standards dict compiled into Python source, one function per
+    # trigger code. check() returns exactly what run() would.
+    def __init__(self, standards: dict):
+        self.standards = standards
+        self.ruleset_hash = ruleset_hash(standards)
+        self.standards_dict = _build_standards_dict(standards)
+        self.source = _generate_source(self.standards_dict)
+
+        namespace = _compile_source(self.source, self.ruleset_hash[:12])
+        self.check = namespace["check"]
+        self._gate_plan = _build_gate_plan(self.standards_dict)
+
+    def check_batch(
+        self,
+        episodes,
+        cache=None,
+        batch_size: int = 500,
+        stats: dict = None,
+        max_codes: int = None,
+    ):
+        return check_batch(self, episodes, cache, batch_size, stats, max_codes)
+
+    def first_failure(self, icd10s: list, severity: str = None):
+        return _first_failure(self._gate_plan, icd10s, severity)
+
+    def is_clean(self, icd10s: list, severity: str = "E") -> bool:
+        return self.first_failure(icd10s, severity) == None
+
+
+def get_engine(type: str = "icd10", standards: dict = None) -> Engine:
+    # Engines are compiled once per ruleset and shared. The built in sets
+    # are also cached by type, so the common case skips hashing.
+    if standards == None:
+        if type.upper() in _ENGINES:
+            return _ENGINES[type.upper()]
+        standards = _standards_for(type)
+
+    key = ruleset_hash(standards)
+    if key not in _ENGINES:
+        _ENGINES[key] = Engine(standards)
+    if standards is icd10_standards_dict:
+        _ENGINES["ICD10"] = _ENGINES[key]
+    elif standards is opcs4_standards_dict:
+        _ENGINES["OPCS4"] = _ENGINES[key]
+    return _ENGINES[key]
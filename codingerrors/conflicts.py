@@ -0,0 +1,172 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Which of the codes already entered a candidate code would conflict with if
+# it were coded next, for suggesting codes as they are typed. Built once from
+# the compiled standards as a graph between trigger keys and value keys, so a
+# lookup only touches the edges of the candidate and the codes entered.
+#
+# This is advisory: only rules between two single codes and never coded
+# combinations (A&B:/*) are covered, each standard's own @ exception codes are
+# honoured (unlike run(), see check._exception_values) and rules that a later
+# code could still satisfy (<, {) are not reported. Combinations are reported
+# whenever all their codes are present, although run() only matches them as
+# aligned chunks. Use run() for the final check.
+
+from functools import lru_cache
+
+from .standards import _build_standards_dict, _standards_for
+from .utils import trigger_keys
+
+# Rules that relate the trigger code to the codes in their values.
+_PAIRWISE = ("!", ">", "£", ")", "$", "€", "¬")
+
+
+def value_keys(code: str) -> list:
+    # The rule values that match code: exact, X (value[:-1] == code) and
+    # three character prefixes.
+    keys = [code, "%sX" % (code)]
+    if len(code) > 3:
+        keys.append(code[0:3])
+    return keys
+
+
+def _conflicts(rule: str, trigger: int, value: int, position: int) -> bool:
+    # trigger/value are the positions of the two codes; the candidate is
+    # coded at position (the end).
+    if rule == "!":
+        return True
+    elif rule == ">":
+        return value == trigger + 1
+    elif rule == "£":
+        return value > trigger
+    elif rule == ")":
+        return abs(value - trigger) != 1
+    elif rule in ("$", "€"):
+        return value != trigger - 1
+    elif rule == "¬":
+        return trigger == 0 and value == 1
+    return False
+
+
+class ConflictGraph:
+    def __init__(self, standards_dict: dict):
+        # standards_dict is compiled (see standards._build_standards_dict).
+        # by_trigger[trigger] = [(standard, rule, values, exceptions)]
+        # by_value[value] = [(trigger, standard, rule, exceptions)]
+        self.by_trigger = {}
+        self.by_value = {}
+        self.never = {}
+        self.combinations = {}
+        for trigger, returned_standard in standards_dict.items():
+            if "&" in trigger:
+                parts = trigger.split("&")
+                for standard, rules in returned_standard.items():
+                    if "/" in rules:
+                        for part in parts:
+                            self.combinations.setdefault(part, []).append(
+                                (parts, standard)
+                            )
+                continue
+            for standard, rules in returned_standard.items():
+                exceptions = frozenset(rules.get("@", ()))
+                if "/" in rules:
+                    self.never.setdefault(trigger, []).append(standard)
+                for rule, values in rules.items():
+                    if rule not in _PAIRWISE:
+                        continue
+                    values = frozenset(values)
+                    self.by_trigger.setdefault(trigger, []).append(
+                        (standard, rule, values, exceptions)
+                    )
+                    for value in values:
+                        self.by_value.setdefault(value, []).append(
+                            (trigger, standard, rule, exceptions)
+                        )
+
+    def conflicts_for(self, candidate: str, current_codes: list) -> list:
+        # [(code, standard, rule)] for each entered code the candidate would
+        # conflict with; code is None where the candidate can never be coded,
+        # or not without a code that isn't there.
+        position = len(current_codes)
+        codes = list(current_codes) + [candidate]
+        keys = None
+        conflicts = []
+
+        for trigger in trigger_keys(candidate):
+            for standard in self.never.get(trigger, ()):
+                conflicts.append((None, standard, "/"))
+
+        for parts, standard in self.combinations.get(candidate, ()):
+            others = list(parts)
+            others.remove(candidate)
+            if all(part in current_codes for part in others):
+                conflicts.extend((part, standard, "/") for part in others)
+
+        # The candidate as the trigger, an entered code as the value.
+        for trigger in trigger_keys(candidate):
+            for standard, rule, values, exceptions in self.by_trigger.get(trigger, ()):
+                if keys == None:
+                    keys = [set(value_keys(code)) for code in codes]
+                if exceptions and any(not k.isdisjoint(exceptions) for k in keys):
+                    continue
+                matched = [i for i in range(position) if not keys[i].isdisjoint(values)]
+                if rule in ("$", "€") and matched == []:
+                    # Needs one of values coded directly before it.
+                    conflicts.append((None, standard, rule))
+                elif rule == "!" and not keys[position].isdisjoint(values):
+                    # Cannot be coded with itself.
+                    conflicts.append((None, standard, rule))
+                for i in matched:
+                    if _conflicts(rule, position, i, position):
+                        conflicts.append((codes[i], standard, rule))
+
+        # The candidate as the value, an entered code as the trigger.
+        for value in value_keys(candidate):
+            for trigger, standard, rule, exceptions in self.by_value.get(value, ()):
+                if keys == None:
+                    keys = [set(value_keys(code)) for code in codes]
+                if exceptions and any(not k.isdisjoint(exceptions) for k in keys):
+                    continue
+                for i in range(position):
+                    if trigger in trigger_keys(codes[i]) and _conflicts(
+                        rule, i, position, position
+                    ):
+                        conflicts.append((codes[i], standard, rule))
+
+        return list(dict.fromkeys(conflicts))
+
+
+@lru_cache(maxsize=None)
+def _builtin_graph(type: str) -> ConflictGraph:
+    return ConflictGraph(_build_standards_dict(_standards_for(type)))
+
+
+def get_conflict_graph(type: str = "icd10") -> ConflictGraph:
+    return _builtin_graph(type.upper())
+
+
+def conflicts_for(candidate: str, current_codes: list, type: str = "icd10") -> list:
+    return get_conflict_graph(type).conflicts_for(candidate, current_codes)
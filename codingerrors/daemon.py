@@ -0,0 +1,302 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# A local daemon holding compiled engines, so short lived jobs on the same
+# host can check episodes without importing and compiling the rules:
+#
+#   python -m codingerrors daemon /tmp/codingerrors.sock
+#
+#   with Client("/tmp/codingerrors.sock") as client:
+#       client.check(["J440", "J22"])
+#
+# Frames are a 4 byte big endian length followed by a JSON object. Requests
+# are {"id", "op", "type", "episodes"} with a batch of code lists, and each
+# connection gets its replies in request order, so a client can send several
+# requests before reading.
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+from queue import Queue
+
+from .metrics import severity_counts
+from .reload import ReloadableEngine
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+def _frame(message: dict) -> bytes:
+    data = json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+    data = data.encode("utf-8")
+    return _HEADER.pack(len(data)) + data
+
+
+def _read_frame(file):
+    # None once the other end has closed the connection.
+    header = file.read(_HEADER.size)
+    if not header:
+        return None
+    elif len(header) < _HEADER.size:
+        raise ConnectionError("Connection closed mid frame")
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError("Frame of %i bytes is over the limit" % (size))
+    data = file.read(size)
+    if len(data) < size:
+        raise ConnectionError("Connection closed mid frame")
+    return json.loads(data.decode("utf-8"))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = _read_frame(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            if request == None:
+                return
+            self.wfile.write(_frame(self.server.daemon.respond(request)))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    def __init__(
+        self,
+        path: str,
+        types: list = ("icd10", "opcs4"),
+        mode: int = 0o600,
+        metrics=None,
+        max_codes: int = None,
+    ):
+        # mode is applied to the socket file; widen it for jobs run by other
+        # users of the host. metrics is a metrics.Metrics to record requests
+        # into. Episodes over max_codes codes get utils.too_many_codes().
+        self.path = path
+        self.mode = mode
+        self.metrics = metrics
+        self.max_codes = max_codes
+        self.engines = {type.upper(): ReloadableEngine(type) for type in types}
+        self._server = None
+        self._thread = None
+
+    def respond(self, request: dict) -> dict:
+        start = time.perf_counter()
+        response = {"id": None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects")
+            response["id"] = request.get("id")
+            op = request.get("op", "check")
+            if op == "ping":
+                response["rulesets"] = {
+                    type.lower(): engine.engine.ruleset_hash
+                    for type, engine in self.engines.items()
+                }
+                response["versions"] = {
+                    type.lower(): engine.version
+                    for type, engine in self.engines.items()
+                }
+            elif op == "check":
+                type = request.get("type", "icd10").upper()
+                if type not in self.engines:
+                    raise ValueError("Unknown standards type: %s" % (type))
+                episodes = request["episodes"]
+                version, engine = self.engines[type].current()
+                response["version"] = version
+                response["results"] = [
+                    results
+                    for _, results in engine.check_batch(
+                        enumerate(episodes),
+                        batch_size=max(len(episodes), 1),
+                        max_codes=self.max_codes,
+                    )
+                ]
+            else:
+                raise ValueError("Unknown op: %s" % (op))
+        except Exception as e:
+            response["error"] = "%s: %s" % (e.__class__.__name__, e)
+        if self.metrics != None:
+            self._record(request, response, time.perf_counter() - start)
+        return response
+
+    def _record(self, request: dict, response: dict, seconds: float):
+        metrics = self.metrics
+        op = request.get("op", "check") if isinstance(request, dict) else "invalid"
+        metrics.observe("request_seconds", seconds, op=op)
+        if "error" in response:
+            metrics.inc("errors", op=op)
+        elif op == "check":
+            counts = {}
+            for results in response["results"]:
+                severity_counts(results, counts)
+            metrics.inc("episodes", len(response["results"]))
+            for name, count in counts.items():
+                metrics.inc("failures", count, severity=name[len("failures:") :])
+
+    def reload(self, standards: dict, type: str = "icd10", **kwargs):
+        # Swaps in new rules for type; see ReloadableEngine.reload.
+        return self.engines[type.upper()].reload(standards, **kwargs)
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise FileExistsError("%s exists and is not a socket" % (self.path))
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                # Left behind by a daemon that didn't shut down cleanly.
+                os.unlink(self.path)
+            else:
+                raise OSError("A daemon is already listening on %s" % (self.path))
+            finally:
+                probe.close()
+        self._server = _Server(self.path, _Handler)
+        self._server.daemon = self
+        os.chmod(self.path, self.mode)
+
+    def serve_forever(self):
+        self._bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def start(self):
+        # Serves on a background thread until stop().
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server != None:
+            self._server.shutdown()
+            self._thread.join()
+            self._close()
+
+    def _close(self):
+        self._server.server_close()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class Client:
+    def __init__(self, path: str, timeout: float = None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path)
+        self._file = self.socket.makefile("rb")
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self.socket.close()
+
+    def _send(self, request: dict) -> int:
+        self._next_id += 1
+        request["id"] = self._next_id
+        self.socket.sendall(_frame(request))
+        return self._next_id
+
+    def _receive(self, id: int):
+        response = _read_frame(self._file)
+        if response == None:
+            raise ConnectionError("The daemon closed the connection")
+        elif response.get("id") != id:
+            raise ConnectionError("Reply %r out of order" % (response.get("id")))
+        elif "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def ping(self) -> dict:
+        # Ruleset hash per type, as loaded by the daemon.
+        return self._receive(self._send({"op": "ping"}))["rulesets"]
+
+    def check_batch(self, episodes: list, type: str = "icd10") -> list:
+        request = {"op": "check", "type": type, "episodes": list(episodes)}
+        return self._receive(self._send(request))["results"]
+
+    def check(self, icd10s: list, type: str = "icd10") -> dict:
+        return self.check_batch([icd10s], type)[0]
+
+    def check_pipelined(self, batches, type: str = "icd10", depth: int = 8):
+        # Yields the results of each batch in order, with up to depth
+        # requests sent ahead of the replies. Requests are sent from a
+        # separate thread so neither end can block the other on a full socket.
+        slots = threading.Semaphore(depth)
+        stop = threading.Event()
+        sent = Queue()
+
+        def send():
+            try:
+                for episodes in batches:
+                    slots.acquire()
+                    if stop.is_set():
+                        break
+                    request = {"op": "check", "type": type, "episodes": list(episodes)}
+                    sent.put(self._send(request))
+            except BaseException as e:
+                sent.put(e)
+            sent.put(None)
+
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        try:
+            while True:
+                id = sent.get()
+                if id == None:
+                    break
+                elif isinstance(id, BaseException):
+                    raise id
+                yield self._receive(id)["results"]
+                slots.release()
+        finally:
+            stop.set()
+            slots.release()
+            sender.join()
+            # Read any replies left by stopping early, so the connection can
+            # still be used.
+            while not sent.empty():
+                id = sent.get()
+                if isinstance(id, int):
+                    self._receive(id)
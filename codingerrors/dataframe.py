@@ -0,0 +1,115 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# A pandas accessor for wide tables of episodes, one row per episode and one
+# column per code slot (DIAG_01..DIAG_20):
+#
+#   import codingerrors.dataframe
+#   failures = df.codingerrors.check(diag_cols=["DIAG_01", "DIAG_02"])
+#
+# Each distinct code is normalised once and each distinct row of codes is
+# checked once, so repeated episodes cost a dictionary lookup.
+
+try:
+    import pandas as pd
+except ImportError:
+    raise ImportError(
+        "codingerrors.dataframe needs pandas, install it with "
+        "pip install codingerrors[pandas]"
+    )
+
+from .compiler import get_engine
+from .standards import _severity
+from .utils import failures, normalise
+
+COLUMNS = ["row", "code", "standard", "operator", "severity", "note"]
+
+
+def _episodes(df, diag_cols: list) -> list:
+    # Code lists per row, blank and missing slots dropped.
+    labels, uniques = pd.factorize(df[diag_cols].to_numpy(dtype=object).ravel())
+    uniques = [normalise(str(code)) for code in uniques]
+    width = len(diag_cols)
+    episodes = []
+    for start in range(0, len(labels), width):
+        episodes.append(
+            tuple(
+                uniques[label]
+                for label in labels[start : start + width]
+                if label >= 0 and uniques[label] != ""
+            )
+        )
+    return episodes
+
+
+def _row_failures(df, diag_cols: list, engine) -> list:
+    # (code, standard, operator, severity, note) per row; identical rows
+    # share one list.
+    checked = {}
+    found = []
+    for icd10s in _episodes(df, diag_cols):
+        if icd10s not in checked:
+            checked[icd10s] = [
+                (code, standard, operator, _severity(standard), failure.get("note"))
+                for code, standard, operator, failure in failures(
+                    engine.check(list(icd10s))
+                )
+            ]
+        found.append(checked[icd10s])
+    return found
+
+
+def check_frame(df, diag_cols: list = None, type: str = "icd10", engine=None):
+    # Long format failures, one row per code, standard and operator.
+    if diag_cols == None:
+        diag_cols = list(df.columns)
+    if engine == None:
+        engine = get_engine(type)
+
+    rows = []
+    for label, found in zip(df.index, _row_failures(df, diag_cols, engine)):
+        rows.extend((label,) + failure for failure in found)
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+@pd.api.extensions.register_dataframe_accessor("codingerrors")
+class CodingErrorsAccessor:
+    def __init__(self, df):
+        self._df = df
+
+    def check(self, diag_cols: list = None, type: str = "icd10", engine=None):
+        return check_frame(self._df, diag_cols, type, engine)
+
+    def is_clean(
+        self, diag_cols: list = None, type: str = "icd10", severity: str = "E"
+    ):
+        # Boolean Series aligned with the frame's index.
+        if diag_cols == None:
+            diag_cols = list(self._df.columns)
+        clean = [
+            not any(severity == None or f[3] == severity for f in found)
+            for found in _row_failures(self._df, diag_cols, get_engine(type))
+        ]
+        return pd.Series(clean, index=self._df.index, dtype=bool)
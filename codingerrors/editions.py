@@ -0,0 +1,148 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Several editions of the standards loaded at once, each in force from its
+# start date until the next one begins. Editions are compiled together: a
+# trigger whose standards are unchanged between editions is compiled once and
+# shared, so each extra edition costs only what it changes plus its own
+# trigger table.
+
+import json
+from bisect import bisect_right
+from datetime import date, datetime
+
+from .compiler import (
+    _Source,
+    _compile_source,
+    _emit_check,
+    _emit_trigger,
+    _module_source,
+    check_batch,
+    ruleset_hash,
+)
+from .standards import _build_standards_dict
+
+
+def _date(value) -> date:
+    # A date, datetime or ISO 8601 string ("2022-04-01", "2022-04-01T09:30").
+    if isinstance(value, datetime):
+        return value.date()
+    elif isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[0:10])
+
+
+class Edition:
+    def __init__(self, start: date, standards: dict, check):
+        self.start = start
+        self.standards = standards
+        self.ruleset_hash = ruleset_hash(standards)
+        self.check = check
+
+    def __repr__(self) -> str:
+        return "Edition(%s)" % (self.start.isoformat())
+
+    def check_batch(
+        self, episodes, cache=None, batch_size: int = 500, stats=None, max_codes=None
+    ):
+        return check_batch(self, episodes, cache, batch_size, stats, max_codes)
+
+
+class Editions:
+    def __init__(self, editions: dict):
+        # editions: {start date: standards dict}
+        starts = sorted(
+            ((_date(start), standards) for start, standards in editions.items()),
+            key=lambda edition: edition[0],
+        )
+        if starts == []:
+            raise ValueError("No editions given")
+        for (start, _), (next_start, _) in zip(starts, starts[1:]):
+            if start == next_start:
+                raise ValueError("Duplicate edition start %s" % (start.isoformat()))
+
+        source = _Source()
+        functions = {}
+        tables = []
+        for start, standards in starts:
+            triggers = {}
+            for trigger, returned_standard in _build_standards_dict(standards).items():
+                key = (
+                    "&" in trigger,
+                    json.dumps(returned_standard, ensure_ascii=False),
+                )
+                if key not in functions:
+                    functions[key] = "_t%i" % (len(functions))
+                    _emit_trigger(source, functions[key], trigger, returned_standard)
+                triggers[trigger] = functions[key]
+            tables.append(triggers)
+        for index, triggers in enumerate(tables):
+            _emit_check(
+                source, "check_%i" % (index), "_triggers_%i" % (index), triggers
+            )
+
+        self.source = _module_source(source)
+        self.functions = len(functions)
+        namespace = _compile_source(self.source, "editions")
+        self.editions = [
+            Edition(start, standards, namespace["check_%i" % (index)])
+            for index, (start, standards) in enumerate(starts)
+        ]
+        self._starts = [edition.start for edition in self.editions]
+
+    def __len__(self) -> int:
+        return len(self.editions)
+
+    def edition_for(self, when) -> Edition:
+        index = bisect_right(self._starts, _date(when)) - 1
+        if index < 0:
+            raise ValueError("No edition in force on %s" % (_date(when)))
+        return self.editions[index]
+
+    def check(self, icd10s: list, when) -> dict:
+        return self.edition_for(when).check(icd10s)
+
+    def check_batch(self, episodes, cache=None, batch_size: int = 500):
+        # episodes: iterable of (episode id, date, codes), in any mix of
+        # editions. Yields (episode id, edition, results) in the same order.
+        batch = []
+        for episode in episodes:
+            batch.append(episode)
+            if len(batch) == batch_size:
+                yield from self._check_routed(batch, cache)
+                batch = []
+        if batch:
+            yield from self._check_routed(batch, cache)
+
+    def _check_routed(self, batch: list, cache) -> list:
+        routed = {}
+        for index, (_, when, icd10s) in enumerate(batch):
+            routed.setdefault(self.edition_for(when), []).append((index, icd10s))
+
+        checked = [None] * len(batch)
+        for edition, episodes in routed.items():
+            for index, results in edition.check_batch(episodes, cache, len(episodes)):
+                checked[index] = (batch[index][0], edition, results)
+        return checked
@@ -0,0 +1,140 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from functools import lru_cache
+
+from .check import _exception_values, _rule_fails, _value_present
+from .standards import _build_standards_dict, _severity, _standards_for
+from .utils import chunk_keys, trigger_keys
+
+# Cheapest rules first: fixed checks on the triggering code, then set
+# lookups against the episode, then anything that needs code positions.
+_RULE_COST = {
+    "!": 1,
+    "{": 1,
+    "€": 2,
+    "£": 2,
+    "¿": 2,
+    ")": 2,
+    "¬": 2,
+    "$": 2,
+    ">": 2,
+    "<": 2,
+}
+
+
+def _build_gate_plan(standards_dict: dict) -> tuple:
+    plan = {}
+    sizes = set()
+
+    for trigger, returned_standard in standards_dict.items():
+        if "&" in trigger:
+            sizes.add(trigger.count("&") + 1)
+
+        tiers = ([], [], [])
+        for standard, rules in returned_standard.items():
+            ordered = sorted(rules.items(), key=lambda r: _RULE_COST.get(r[0], 0))
+            tier = max([_RULE_COST.get(rule, 0) for rule in rules] or [0])
+            tiers[tier].append((standard, _severity(standard), ordered, "@" in rules))
+
+        plan[trigger] = (tiers, _exception_values(returned_standard))
+
+    return plan, sizes
+
+
+@lru_cache(maxsize=None)
+def _builtin_gate_plan(type: str) -> tuple:
+    return _build_gate_plan(_build_standards_dict(_standards_for(type)))
+
+
+# Plans for prebuilt standards dicts, by identity. Each entry keeps its dict
+# alive so the id is not reused; the oldest goes once there are too many.
+_PLANS = {}
+_MAX_PLANS = 16
+
+
+def _gate_plan(standards_dict: dict) -> tuple:
+    entry = _PLANS.get(id(standards_dict))
+    if entry == None or entry[0] is not standards_dict:
+        if len(_PLANS) >= _MAX_PLANS:
+            del _PLANS[next(iter(_PLANS))]
+        entry = (standards_dict, _build_gate_plan(standards_dict))
+        _PLANS[id(standards_dict)] = entry
+    return entry[1]
+
+
+def _first_failure(gate_plan: tuple, icd10s: list, severity: str = None):
+    plan, sizes = gate_plan
+
+    applications = {}
+    for icd10 in icd10s:
+        for trigger in trigger_keys(icd10):
+            if trigger in plan:
+                applications[(trigger, icd10)] = plan[trigger]
+    for key in chunk_keys(icd10s, sizes):
+        if key in plan:
+            applications[(key, key)] = plan[key]
+
+    if applications == {}:
+        return None
+
+    codes = set(icd10s)
+    prefixes = {x[0:3] for x in icd10s}
+
+    for tier in range(3):
+        for (trigger, icd10), (tiers, exception_values) in applications.items():
+            for standard, standard_severity, rules, has_exception in tiers[tier]:
+                if severity != None and standard_severity != severity:
+                    continue
+                for rule, values in rules:
+                    if _rule_fails(rule, values, icd10s, icd10, codes, prefixes):
+                        if has_exception and any(
+                            _value_present(v, codes, prefixes) for v in exception_values
+                        ):
+                            break
+                        return (icd10, standard, rule)
+
+    return None
+
+
+def first_failure(
+    icd10s: list, severity: str = None, type: str = "icd10", standards_dict: dict = None
+):
+    # Returns (code, standard, rule) for the first failure found, or None.
+    # Standards are visited cheapest first, so this is not necessarily the
+    # first entry run() would report. A standards_dict is planned on first
+    # use, so it should not be changed afterwards.
+    if standards_dict != None:
+        gate_plan = _gate_plan(standards_dict)
+    else:
+        gate_plan = _builtin_gate_plan(type.upper())
+
+    return _first_failure(gate_plan, icd10s, severity)
+
+
+def is_clean(
+    icd10s: list, severity: str = "E", type: str = "icd10", standards_dict: dict = None
+) -> bool:
+    return first_failure(icd10s, severity, type, standards_dict) == None
@@ -0,0 +1,128 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Working out which episodes a rules release can change, so only those are
+# rechecked. run() only evaluates the standards filed under the trigger keys
+# an episode's codes reach, so an episode can only change if one of its codes
+# reaches a trigger of an added, removed or changed standard.
+
+from .compiler import get_engine
+from .standards import _build_standards_dict
+from .utils import trigger_keys
+
+
+def diff_standards(old: dict, new: dict) -> dict:
+    # Raw standards dicts (key: "?codes:rule:...") compared by key and text.
+    return {
+        "added": [key for key in new if key not in old],
+        "removed": [key for key in old if key not in new],
+        "changed": [key for key in new if key in old and new[key] != old[key]],
+    }
+
+
+def touched_codes(old: dict, new: dict, changes: dict = None) -> dict:
+    # The trigger keys and value codes of every standard in changes, as it
+    # was before and as it is after.
+    if changes == None:
+        changes = diff_standards(old, new)
+    before = changes["removed"] + changes["changed"]
+    after = changes["added"] + changes["changed"]
+
+    triggers, values = set(), set()
+    for standards_dict in (
+        _build_standards_dict({key: old[key] for key in before}),
+        _build_standards_dict({key: new[key] for key in after}),
+    ):
+        for trigger, returned_standard in standards_dict.items():
+            triggers.add(trigger)
+            for rules in returned_standard.values():
+                for rule_values in rules.values():
+                    if isinstance(rule_values, list):
+                        values.update(rule_values)
+    return {"triggers": sorted(triggers), "values": sorted(values)}
+
+
+class EpisodeIndex:
+    # Inverted index from trigger key to the episodes with a code reaching it.
+    def __init__(self, episodes=None):
+        self.episodes = {}
+        self._index = {}
+        for episode_id, icd10s in episodes or ():
+            self.add(episode_id, icd10s)
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    def add(self, episode_id, icd10s: list):
+        self.episodes[episode_id] = icd10s
+        for icd10 in icd10s:
+            for key in trigger_keys(icd10):
+                self._index.setdefault(key, set()).add(episode_id)
+
+    def affected(self, triggers: list) -> set:
+        found = set()
+        for trigger in triggers:
+            if "&" in trigger:
+                # Combinations only match as aligned chunks of exact codes,
+                # so having every part is a superset of the real matches.
+                parts = [self._index.get(part, set()) for part in trigger.split("&")]
+                found.update(set.intersection(*parts))
+            else:
+                found.update(self._index.get(trigger, ()))
+        return found
+
+
+def impact(old: dict, new: dict, episodes, cache=None) -> dict:
+    # Rechecks the episodes a change from old to new standards can affect and
+    # returns the ones whose results differ. episodes is an EpisodeIndex or an
+    # iterable of (episode id, codes); cache is an optional ResultCache, which
+    # usually already holds the results under the old rules.
+    if not isinstance(episodes, EpisodeIndex):
+        episodes = EpisodeIndex(episodes)
+    changes = diff_standards(old, new)
+    touched = touched_codes(old, new, changes)
+
+    ids = episodes.affected(touched["triggers"])
+    affected = [
+        (episode_id, icd10s)
+        for episode_id, icd10s in episodes.episodes.items()
+        if episode_id in ids
+    ]
+
+    before = get_engine(standards=old).check_batch(affected, cache)
+    after = get_engine(standards=new).check_batch(affected, cache)
+    diff = []
+    for (episode_id, old_results), (_, new_results) in zip(before, after):
+        if old_results != new_results:
+            diff.append({"id": episode_id, "before": old_results, "after": new_results})
+
+    return {
+        "changes": changes,
+        "triggers": touched["triggers"],
+        "values": touched["values"],
+        "episodes": len(episodes),
+        "checked": len(affected),
+        "diff": diff,
+    }
@@ -0,0 +1,254 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# Throughput and latency of batch and daemon runs. A Metrics registry holds
+# counters, gauges and histograms; pipelines and daemons only record into
+# one when it is given, once per batch, so runs without metrics pay nothing.
+# A Reporter writes the registry to sinks every interval: Prometheus text
+# (a file for the node exporter's textfile collector, or an HTTP endpoint)
+# and JSON lines with per-second rates.
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .standards import _severity
+from .utils import failures
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def severity_counts(results: dict, counts: dict = None) -> dict:
+    # {"failures:E": n, ...} for one episode's results, added to counts.
+    counts = {} if counts == None else counts
+    for code, standard, operator, failure in failures(results):
+        key = "failures:" + _severity(standard)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _series(name: str, labels: tuple) -> str:
+    # failures, (("severity", "E"),) -> 'failures{severity="E"}'
+    if not labels:
+        return name
+    return "%s{%s}" % (name, ",".join('%s="%s"' % (k, v) for k, v in labels))
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": dict(
+                zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)
+            ),
+        }
+
+
+class Metrics:
+    def __init__(self, prefix: str = "codingerrors", buckets: tuple = BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        # Called with the registry before each snapshot, to set gauges that
+        # are read rather than recorded, such as queue depths.
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(value)
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    def snapshot(self) -> dict:
+        self.collect()
+        with self._lock:
+            return {
+                "time": round(time.time(), 3),
+                "counters": {_series(*k): v for k, v in self.counters.items()},
+                "gauges": {_series(*k): v for k, v in self.gauges.items()},
+                "histograms": {
+                    _series(*k): h.as_dict() for k, h in self.histograms.items()
+                },
+            }
+
+    def prometheus(self) -> str:
+        self.collect()
+        lines = []
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in values}):
+                    full = "%s_%s" % (self.prefix, name)
+                    if kind == "counter":
+                        full += "_total"
+                    lines.append("# TYPE %s %s" % (full, kind))
+                    for (n, labels), value in sorted(values.items()):
+                        if n == name:
+                            lines.append("%s %s" % (_series(full, labels), value))
+            for name in sorted({name for name, _ in self.histograms}):
+                full = "%s_%s" % (self.prefix, name)
+                lines.append("# TYPE %s histogram" % (full))
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    total = 0
+                    for le, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        total += count
+                        bucket = _series(full + "_bucket", labels + (("le", le),))
+                        lines.append("%s %i" % (bucket, total))
+                    lines.append("%s %s" % (_series(full + "_sum", labels), h.sum))
+                    lines.append("%s %i" % (_series(full + "_count", labels), h.count))
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusFile:
+    # Rewrites path on every report; readers never see half a file.
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, metrics: Metrics, snapshot: dict):
+        temporary = "%s.%i.tmp" % (self.path, os.getpid())
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus())
+        os.replace(temporary, self.path)
+
+    def close(self):
+        pass
+
+
+class JsonLines:
+    # One line per report: the snapshot plus "rates", each counter's change
+    # per second since the previous line.
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._last = None
+
+    def write(self, metrics: Metrics, snapshot: dict):
+        line, now = dict(snapshot), time.perf_counter()
+        if self._last != None:
+            seconds, previous = now - self._last[0], self._last[1]["counters"]
+            line["rates"] = {
+                series: round((value - previous.get(series, 0)) / seconds, 3)
+                for series, value in snapshot["counters"].items()
+            }
+        self._last = (now, snapshot)
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(metrics: Metrics, port: int, host: str = "127.0.0.1"):
+    # Serves GET /metrics on a daemon thread; shutdown() the result to stop.
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Reporter:
+    def __init__(self, metrics: Metrics, sinks: list, interval: float = 10.0):
+        self.metrics = metrics
+        self.sinks = sinks
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def report(self):
+        snapshot = self.metrics.snapshot()
+        for sink in self.sinks:
+            sink.write(self.metrics, snapshot)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Reports once more, so short runs still leave their totals behind.
+        self._stopped.set()
+        if self._thread != None:
+            self._thread.join()
+        self.report()
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,94 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# Local rules layered over the national standards. An overlay adds or
+# replaces standards by key and switches national ones off by key prefix or
+# severity; the merged set is compiled once and shared like any other
+# ruleset, so checking against it costs the same as the national rules.
+
+import json
+
+from .compiler import Engine, get_engine
+from .standards import _severity, _standards_for
+
+
+class Overlay:
+    def __init__(
+        self,
+        standards: dict = None,
+        disable: list = (),
+        disable_severities: list = (),
+        name: str = None,
+    ):
+        # standards: key -> standard string; a national key is replaced in
+        # place, a new key is checked after the national ones. disable: key
+        # prefixes, e.g. "DChS.XIII". disable_severities: e.g. ["W"]. Local
+        # standards are never disabled.
+        self.standards = dict(standards or {})
+        self.disable = list(disable)
+        self.disable_severities = [s.upper() for s in disable_severities]
+        self.name = name
+        self._engines = {}
+
+    @classmethod
+    def from_json(cls, path: str) -> "Overlay":
+        # {"name": ..., "standards": {...}, "disable": [...],
+        #  "disable_severities": [...]}
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def disabled(self, key: str, standard: str) -> bool:
+        # Whether apply() drops the base standard key, whose rules are the
+        # string standard. Overlays only go by the key; subclasses may look
+        # at the rules too (see profiles.Profile).
+        if key in self.standards:
+            return False
+        if _severity(key) in self.disable_severities:
+            return True
+        return any(key.startswith(prefix) for prefix in self.disable)
+
+    def apply(self, base: dict) -> dict:
+        merged = {
+            key: standard
+            for key, standard in base.items()
+            if not self.disabled(key, standard)
+        }
+        merged.update(self.standards)
+        return merged
+
+    def merged(self, type: str = "icd10") -> dict:
+        return self.apply(_standards_for(type))
+
+    def engine(self, type: str = "icd10") -> Engine:
+        # get_engine shares engines between overlays with the same merged
+        # rules; keeping it here as well skips hashing them on every call.
+        if type.upper() not in self._engines:
+            self._engines[type.upper()] = get_engine(type, self.merged(type))
+        return self._engines[type.upper()]
+
+    def check(self, icd10s: list, type: str = "icd10") -> dict:
+        return self.engine(type).check(icd10s)
+
+    def check_batch(self, episodes, type: str = "icd10", **kwargs):
+        return self.engine(type).check_batch(episodes, **kwargs)
@@ -0,0 +1,532 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# File to file checking as four stages on their own threads, joined by
+# bounded queues so a slow stage holds back the ones feeding it:
+#
+#   read lines -> parse/normalise -> check (process pool) -> write
+#
+# Work moves between stages in batches to keep queue overhead down.
+
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from queue import Empty, Full, Queue
+
+from .cache import ResultCache
+from .compiler import get_engine
+from .metrics import severity_counts
+from .rulepack import attach, publish
+from .standards import _standards_for
+from .utils import normalise
+
+_DONE = object()
+
+_worker_checker = None
+_worker_cache = None
+
+
+def _load_checker(type: str, segment: str = None, standards: dict = None):
+    if segment != None:
+        rule_pack = attach(segment)
+        # Pool workers leave through os._exit, so atexit would never run.
+        Finalize(rule_pack, rule_pack.close, exitpriority=10)
+        return rule_pack
+    return get_engine(type, standards)
+
+
+def _open_cache(path: str):
+    if path == None:
+        return None
+    cache = ResultCache(path)
+    Finalize(cache, cache.close, exitpriority=10)
+    return cache
+
+
+def _init_worker(
+    type: str, segment: str = None, cache_path: str = None, standards: dict = None
+):
+    global _worker_checker, _worker_cache
+    _worker_checker = _load_checker(type, segment, standards)
+    _worker_cache = _open_cache(cache_path)
+
+
+def _check_batch(
+    batch: list,
+    format,
+    checker=None,
+    cache=None,
+    measure: bool = False,
+    max_codes: int = None,
+) -> tuple:
+    # Results are formatted where they are checked, so only one string per
+    # batch travels back from the pool, with the batch's counts. measure
+    # adds the time spent and failures by severity, for metrics.
+    checker = checker or _worker_checker
+    cache = cache or _worker_cache
+    start = time.perf_counter()
+    hits, misses = (cache.hits, cache.misses) if cache != None else (0, 0)
+    counts = {"episodes": 0, "distinct": 0}
+    checked = checker.check_batch(
+        ((record, codes) for record, id, codes in batch),
+        cache,
+        len(batch) or 1,
+        counts,
+        max_codes,
+    )
+    if measure:
+        checked = list(checked)
+        for _, results in checked:
+            severity_counts(results, counts)
+    text = "".join(
+        format(record, id, results)
+        for (_, id, _), (record, results) in zip(batch, checked)
+    )
+    if measure:
+        counts["seconds"] = time.perf_counter() - start
+    if cache != None:
+        counts["hits"] = cache.hits - hits
+        counts["misses"] = cache.misses - misses
+    return text, counts
+
+
+def parse_csv(lines: list) -> list:
+    # One (episode id, codes) per line, None for blank lines. Lines are
+    # "id,code,code,..." and blank code columns are skipped.
+    episodes = []
+    for row in csv.reader(lines):
+        if row == [] or row[0].strip() == "":
+            episodes.append(None)
+            continue
+        codes = [normalise(code) for code in row[1:]]
+        episodes.append((row[0].strip(), [code for code in codes if code != ""]))
+    return episodes
+
+
+def format_jsonl(record: int, id: str, results: dict) -> str:
+    return (
+        json.dumps({"record": record, "id": id, "results": results}, ensure_ascii=False)
+        + "\n"
+    )
+
+
+class StageStats:
+    # busy is the stage's wall time less the time spent blocked on its
+    # input or output queue.
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.waiting = 0.0
+        self.started = None
+        self.finished = None
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def sample(self, depth: int):
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    @property
+    def busy(self) -> float:
+        if self.started == None:
+            return 0.0
+        finished = self.finished or time.perf_counter()
+        return max(finished - self.started - self.waiting, 0.0)
+
+    def as_dict(self) -> dict:
+        busy = self.busy
+        return {
+            "items": self.items,
+            "busy_seconds": round(busy, 6),
+            "waiting_seconds": round(self.waiting, 6),
+            "items_per_second": round(self.items / busy, 1) if busy else 0.0,
+            "max_queue_depth": self.max_depth,
+            "mean_queue_depth": (
+                round(self._depth_total / self._depth_samples, 2)
+                if self._depth_samples
+                else 0.0
+            ),
+        }
+
+
+class _Aborted(Exception):
+    pass
+
+
+class Pipeline:
+    def __init__(
+        self,
+        type: str = "icd10",
+        workers: int = None,
+        batch_size: int = 500,
+        queue_size: int = 8,
+        shared_rules: bool = False,
+        parse=parse_csv,
+        format=format_jsonl,
+        cache: str = None,
+        standards: dict = None,
+        metrics=None,
+        max_codes: int = None,
+    ):
+        # workers=0 checks on the check stage's own thread instead of a pool.
+        # shared_rules publishes one rule pack for all workers to attach to.
+        # parse=None takes source as (episode id, codes) pairs, e.g. from
+        # readers.read_fixed_width. cache is the path of a ResultCache
+        # database; episodes already checked against these rules are not
+        # checked again. standards replaces the built in rules for type, e.g.
+        # Overlay.merged(type). metrics is a metrics.Metrics to record
+        # throughput, failures and stage latencies into. Episodes with more
+        # than max_codes codes are not checked; see compiler.check_batch.
+        self.type = type
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.shared_rules = shared_rules
+        self.parse = parse
+        self.format = format
+        self.cache = cache
+        self.standards = standards
+        self.metrics = metrics
+        self.max_codes = max_codes
+
+    def _alive(self):
+        # A stage thread that died before its target ran, e.g. in a profile
+        # hook, never reports an error or sends _DONE.
+        for thread, stats in self._threads:
+            if stats.finished == None and not thread.is_alive():
+                raise RuntimeError("The %s stage stopped unexpectedly" % (stats.name))
+
+    def _put(self, queue: Queue, item, stats: StageStats):
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._failed.is_set():
+                    raise _Aborted()
+                try:
+                    return queue.put(item, timeout=0.1)
+                except Full:
+                    self._alive()
+        finally:
+            stats.waiting += time.perf_counter() - start
+
+    def _get(self, queue: Queue, stats: StageStats):
+        stats.sample(queue.qsize())
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._failed.is_set():
+                    raise _Aborted()
+                try:
+                    return queue.get(timeout=0.1)
+                except Empty:
+                    self._alive()
+        finally:
+            stats.waiting += time.perf_counter() - start
+
+    def _stage(self, target, stats: StageStats, *args):
+        def wrapped():
+            stats.started = time.perf_counter()
+            try:
+                target(*args, stats)
+            except _Aborted:
+                pass
+            except BaseException as e:
+                self._errors.append(e)
+                self._failed.set()
+            finally:
+                stats.finished = time.perf_counter()
+
+        thread = threading.Thread(target=wrapped, daemon=True)
+        self._threads.append((thread, stats))
+        thread.start()
+        return thread
+
+    def _read(self, source, out: Queue, stats: StageStats):
+        batch, record = [], self._start
+        for line in source:
+            batch.append((record, line))
+            record += 1
+            if len(batch) == self.batch_size:
+                stats.items += len(batch)
+                self._put(out, batch, stats)
+                batch = []
+        if batch:
+            stats.items += len(batch)
+            self._put(out, batch, stats)
+        self._put(out, _DONE, stats)
+
+    def _parse(self, inp: Queue, out: Queue, stats: StageStats):
+        while True:
+            batch = self._get(inp, stats)
+            if batch is _DONE:
+                return self._put(out, _DONE, stats)
+            start = time.perf_counter()
+            lines = [line for record, line in batch]
+            if self.parse != None:
+                lines = self.parse(lines)
+            parsed = []
+            for (record, line), episode in zip(batch, lines):
+                if episode != None:
+                    parsed.append((record,) + tuple(episode))
+            # With the input offset the batch ends at, for checkpoints.
+            parsed = (batch[-1][0] + 1, parsed)
+            if self.metrics != None:
+                self.metrics.observe(
+                    "batch_seconds", time.perf_counter() - start, stage="parse"
+                )
+            stats.items += len(batch)
+            self._put(out, parsed, stats)
+
+    def _check(self, inp: Queue, out: Queue, segment: str, stats: StageStats):
+        if self.workers == 0:
+            checker = _load_checker(self.type, segment, self.standards)
+            cache = ResultCache(self.cache) if self.cache != None else None
+            try:
+                while True:
+                    batch = self._get(inp, stats)
+                    if batch is _DONE:
+                        return self._put(out, _DONE, stats)
+                    end, batch = batch
+                    text, counts = _check_batch(
+                        batch,
+                        self.format,
+                        checker,
+                        cache,
+                        self.metrics != None,
+                        self.max_codes,
+                    )
+                    stats.items += len(batch)
+                    self._put(out, (len(batch), end, text, counts), stats)
+            finally:
+                if cache != None:
+                    cache.close()
+
+        # Results go downstream in submission order; at most queue_size
+        # batches are in the pool at once.
+        with ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self.type, segment, self.cache, self.standards),
+        ) as pool:
+            in_flight = deque()
+            while True:
+                batch = self._get(inp, stats)
+                if batch is _DONE:
+                    break
+                end, batch = batch
+                future = pool.submit(
+                    _check_batch,
+                    batch,
+                    self.format,
+                    None,
+                    None,
+                    self.metrics != None,
+                    self.max_codes,
+                )
+                in_flight.append((len(batch), end, future))
+                while len(in_flight) >= self.queue_size:
+                    self._forward(in_flight.popleft(), out, stats)
+            while in_flight:
+                self._forward(in_flight.popleft(), out, stats)
+        self._put(out, _DONE, stats)
+
+    def _forward(self, submitted: tuple, out: Queue, stats: StageStats):
+        size, end, future = submitted
+        text, counts = future.result()
+        stats.items += size
+        self._put(out, (size, end, text, counts), stats)
+
+    def _count(self, counts: dict):
+        for name, count in counts.items():
+            self._counts[name] = self._counts.get(name, 0) + count
+        if self.metrics != None:
+            self._record(counts)
+
+    def _record(self, counts: dict):
+        metrics = self.metrics
+        metrics.inc("episodes", counts["episodes"])
+        if "limited" in counts:
+            metrics.inc("limited", counts["limited"])
+        for name, count in counts.items():
+            if name.startswith("failures:"):
+                metrics.inc("failures", count, severity=name[len("failures:") :])
+        if "hits" in counts:
+            metrics.inc("cache_hits", counts["hits"])
+            metrics.inc("cache_misses", counts["misses"])
+        metrics.inc("check_seconds", counts["seconds"])
+        metrics.observe("batch_seconds", counts["seconds"], stage="check")
+
+    def _collector(self, queues: list):
+        # Gauges read when metrics are reported: queue depths, the cache hit
+        # rate, and the share of the checking capacity that was busy since
+        # the last report.
+        workers = self.workers if self.workers != None else os.cpu_count()
+        last = [time.perf_counter(), 0.0]
+
+        def collect(metrics):
+            for stage, queue in zip(("parse", "check", "write"), queues):
+                metrics.set("queue_depth", queue.qsize(), stage=stage)
+            hits, misses = self._counts.get("hits", 0), self._counts.get("misses", 0)
+            if hits + misses:
+                metrics.set("cache_hit_rate", round(hits / (hits + misses), 4))
+            now, busy = time.perf_counter(), self._counts.get("seconds", 0.0)
+            if now > last[0]:
+                utilisation = (busy - last[1]) / ((now - last[0]) * max(workers, 1))
+                metrics.set("worker_utilisation", round(min(utilisation, 1.0), 4))
+            last[:] = [now, busy]
+
+        return collect
+
+    def _write(self, inp: Queue, output, stats: StageStats, checkpoint=None):
+        # Counts are taken as batches are written, so those in a checkpoint
+        # are for exactly the episodes in its parts.
+        episodes = checkpoint.episodes if checkpoint != None else 0
+        while True:
+            batch = self._get(inp, stats)
+            if batch is _DONE:
+                if checkpoint != None:
+                    checkpoint.commit(self._end, episodes + stats.items, self._counts)
+                return
+            size, self._end, text, counts = batch
+            start = time.perf_counter()
+            output.write(text)
+            self._count(counts)
+            if self.metrics != None:
+                self.metrics.observe(
+                    "batch_seconds", time.perf_counter() - start, stage="write"
+                )
+            stats.items += size
+            if checkpoint != None and checkpoint.due(self._end):
+                checkpoint.commit(self._end, episodes + stats.items, self._counts)
+
+    def run(self, source, output, checkpoint=None) -> dict:
+        # source: iterable of input lines. output: writable text file.
+        # checkpoint: a checkpoint.Checkpoint, resumed or not, to write
+        # through instead of output; the source is read from its offset.
+        self._failed = threading.Event()
+        self._errors = []
+        self._threads = []
+        self._counts = {}
+        self._start = self._end = 0
+        if checkpoint != None:
+            self._counts = dict(checkpoint.counts)
+            self._start = self._end = checkpoint.record
+            source = itertools.islice(source, self._start, None)
+            output = checkpoint
+        stats = {name: StageStats(name) for name in ("read", "parse", "check", "write")}
+        queues = [Queue(self.queue_size) for _ in range(3)]
+
+        segment = None
+        if self.shared_rules:
+            standards = self.standards
+            if standards == None:
+                standards = _standards_for(self.type)
+            segment = publish(standards)
+
+        collector = None
+        if self.metrics != None:
+            collector = self._collector(queues)
+            self.metrics.collectors.append(collector)
+
+        start = time.perf_counter()
+        try:
+            threads = [
+                self._stage(self._read, stats["read"], source, queues[0]),
+                self._stage(self._parse, stats["parse"], queues[0], queues[1]),
+                self._stage(
+                    self._check,
+                    stats["check"],
+                    queues[1],
+                    queues[2],
+                    segment.name if segment != None else None,
+                ),
+            ]
+            stats["write"].started = time.perf_counter()
+            try:
+                self._write(queues[2], output, stats["write"], checkpoint)
+            except _Aborted:
+                pass
+            except BaseException:
+                self._failed.set()
+                raise
+            finally:
+                stats["write"].finished = time.perf_counter()
+                for thread in threads:
+                    thread.join()
+        finally:
+            if checkpoint != None:
+                checkpoint.close()
+            if segment != None:
+                segment.close()
+                segment.unlink()
+            if collector != None:
+                collector(self.metrics)
+                self.metrics.collectors.remove(collector)
+
+        if self._errors:
+            raise self._errors[0]
+
+        episodes = stats["write"].items
+        if checkpoint != None:
+            episodes = checkpoint.episodes
+            checkpoint.finish()
+        report = {
+            "episodes": episodes,
+            "seconds": round(time.perf_counter() - start, 6),
+            "stages": {name: s.as_dict() for name, s in stats.items()},
+        }
+        episodes = self._counts.get("episodes", 0)
+        distinct = self._counts.get("distinct", 0)
+        # Share of episodes that reused another episode's results.
+        report["dedup"] = {
+            "episodes": episodes,
+            "distinct": distinct,
+            "ratio": round(1 - distinct / episodes, 4) if episodes else 0.0,
+        }
+        if checkpoint != None:
+            report["resumed_from"] = self._start
+        if self.max_codes != None:
+            report["limited"] = self._counts.get("limited", 0)
+        if self.cache != None:
+            report["cache"] = {
+                "hits": self._counts.get("hits", 0),
+                "misses": self._counts.get("misses", 0),
+            }
+        return report
+
+    def run_file(self, input_path: str, output_path: str, checkpoint=None) -> dict:
+        with open(input_path, newline="") as source:
+            if checkpoint != None:
+                return self.run(source, None, checkpoint)
+            with open(output_path, "w") as output:
+                return self.run(source, output)
@@ -0,0 +1,79 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# Checking against part of the standards. A profile keeps the standards
+# whose key, severity and operators match and compiles only those, so the
+# engine's triggers and value sets shrink with the selection.
+
+from fnmatch import fnmatchcase
+
+from .overlays import Overlay
+from .standards import _severity
+
+
+def operators(standard: str) -> set:
+    # "?F100:!T36-T50:@T510" -> {"!"}; @ only excepts codes from the others.
+    return {rule[0] for rule in standard.split(":")[1:] if rule[:1] not in ("", "@")}
+
+
+class Profile(Overlay):
+    def __init__(
+        self,
+        keys: list = None,
+        severities: list = None,
+        operators: list = None,
+        name: str = None,
+    ):
+        # keys: fnmatch patterns, e.g. "DCS.XV.*" or "*PLAC:*". severities:
+        # e.g. ["E"]. operators: e.g. ["!"]. A standard is kept if it matches
+        # every criterion given.
+        super().__init__(name=name)
+        self.keys = list(keys) if keys != None else None
+        self.severities = [s.upper() for s in severities] if severities else None
+        self.operators = set(operators) if operators != None else None
+
+    def disabled(self, key: str, standard: str) -> bool:
+        if self.keys != None and not any(fnmatchcase(key, p) for p in self.keys):
+            return True
+        if self.severities != None and _severity(key) not in self.severities:
+            return True
+        if self.operators != None:
+            return not (operators(standard) & self.operators)
+        return False
+
+
+PROFILES = {
+    "errors": Profile(severities=["E"], name="errors"),
+    "obstetrics": Profile(keys=["DCS.XV.*"], name="obstetrics"),
+    "placement": Profile(keys=["*PLAC:*"], name="placement"),
+}
+
+
+def get_profile(name: str) -> Profile:
+    # One of PROFILES, or the path of a JSON object of Profile arguments.
+    if name.endswith(".json"):
+        return Profile.from_json(name)
+    if name not in PROFILES:
+        raise ValueError("Unknown profile: %s" % (name))
+    return PROFILES[name]
@@ -0,0 +1,147 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# Where the time goes in a slow run. cprofile mode records every call with
+# cProfile, in every thread that runs while it is on; sample mode only looks at
+# the stacks of running threads every interval, which costs little enough
+# for long runs. Both write a collapsed stack file (one "frame;frame;frame
+# count" line per stack, as read by flamegraph.pl and speedscope) in which
+# frames checking a standard are labelled with its key, and cprofile mode
+# also writes pstats.
+
+import cProfile
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from .check import _check_rule, _exclusive
+
+MODES = ("cprofile", "sample")
+
+# Functions whose standard argument is the key being checked, from run() and
+# from compiled engines alike.
+_KEYED = {_check_rule.__code__, _exclusive.__code__}
+_IDLE = vars(threading)
+# From 3.12 cProfile is built on sys.monitoring: one profiler sees every
+# thread, and a second one cannot be enabled at all.
+_PER_THREAD = sys.version_info < (3, 12)
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    label = "%s:%s" % (module, code.co_name)
+    if code in _KEYED:
+        label += " [%s]" % (frame.f_locals.get("standard"))
+    return label
+
+
+def collapse(frame, root: str = None) -> str:
+    labels = []
+    while frame != None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    if root != None:
+        labels.append(root)
+    return ";".join(reversed(labels))
+
+
+class Profiler:
+    def __init__(self, mode: str = "cprofile", interval: float = 0.005):
+        if mode not in MODES:
+            raise ValueError("Unknown profile mode: %s" % (mode))
+        self.mode = mode
+        self.interval = interval
+        self.stacks = Counter()
+        self._profiles = []
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def _profile_thread(self, *args):
+        # Installed with threading.setprofile, so it runs once in each new
+        # thread and hands that thread over to its own cProfile.
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+
+    def _sample(self):
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                # Threads waiting on a lock or queue are idle, not slow.
+                if ident == threading.get_ident() or frame.f_globals is _IDLE:
+                    continue
+                self.stacks[collapse(frame, names.get(ident, str(ident)))] += 1
+
+    def start(self):
+        # The sampler starts first so that it is not profiled itself.
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        if self.mode == "cprofile":
+            if _PER_THREAD:
+                threading.setprofile(self._profile_thread)
+            self._profile_thread()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+        if self.mode == "cprofile":
+            if _PER_THREAD:
+                threading.setprofile(None)
+            for profile in self._profiles:
+                profile.disable()
+
+    def stats(self) -> pstats.Stats:
+        if self.mode != "cprofile":
+            raise ValueError("Sampled profiles have no pstats")
+        return pstats.Stats(*self._profiles)
+
+    def write(self, path: str) -> list:
+        # Writes path.folded, and path.pstats in cprofile mode.
+        written = []
+        if self.mode == "cprofile":
+            self.stats().dump_stats(path + ".pstats")
+            written.append(path + ".pstats")
+        with open(path + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("%s %i\n" % (stack, count))
+        written.append(path + ".folded")
+        return written
+
+
+@contextmanager
+def profiled(path: str = None, mode: str = "cprofile", interval: float = 0.005):
+    # with profiled("slow"): ... writes slow.pstats and slow.folded on exit.
+    profiler = Profiler(mode, interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        if path != None:
+            profiler.write(path)
@@ -0,0 +1,139 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import mmap
+import os
+import struct
+
+
+class FixedWidthLayout:
+    # Byte offsets within a record. id and each code slot are (offset, width).
+    # With record_length set (newline included) records are found by stride
+    # rather than by searching for line ends.
+    def __init__(
+        self,
+        id: tuple,
+        codes: list,
+        record_length: int = None,
+        encoding: str = "ascii",
+        normalise=None,
+    ):
+        self.id = tuple(id)
+        self.codes = [tuple(slot) for slot in codes]
+        self.record_length = record_length
+        self.encoding = encoding
+        self.normalise = normalise
+
+    @classmethod
+    def from_json(cls, path: str) -> "FixedWidthLayout":
+        # {"id": [0, 12], "codes": [[12, 6], [18, 6]], "record_length": 133}
+        with open(path) as f:
+            layout = json.load(f)
+        return cls(
+            layout["id"],
+            layout["codes"],
+            layout.get("record_length"),
+            layout.get("encoding", "ascii"),
+        )
+
+
+def _unpacker(layout: FixedWidthLayout) -> tuple:
+    # One struct for the whole record, so every field comes out of the
+    # buffer in a single call. Returns the struct and where the id and code
+    # fields land in the unpacked tuple.
+    fields = sorted([layout.id] + layout.codes)
+    fmt, position = "=", 0
+    for offset, width in fields:
+        if offset < position:
+            raise ValueError("Fixed-width fields overlap at offset %i" % (offset))
+        if offset > position:
+            fmt += "%ix" % (offset - position)
+        fmt += "%is" % (width)
+        position = offset + width
+    if layout.record_length and layout.record_length < position:
+        raise ValueError(
+            "Fixed-width record_length %i is shorter than its fields (%i bytes)"
+            % (layout.record_length, position)
+        )
+    if layout.record_length and layout.record_length > position:
+        fmt += "%ix" % (layout.record_length - position)
+
+    order = {field: i for i, field in enumerate(fields)}
+    return struct.Struct(fmt), order[layout.id], [order[slot] for slot in layout.codes]
+
+
+def _unpacked(buffer, unpacker: struct.Struct, record_length: int = None):
+    size = len(buffer)
+    if record_length:
+        whole = size - size % record_length
+        with memoryview(buffer) as view:
+            yield from unpacker.iter_unpack(view[:whole])
+        if whole < size:
+            yield unpacker.unpack(buffer[whole:].ljust(unpacker.size))
+        return
+
+    start = 0
+    while start < size:
+        end = buffer.find(b"\n", start)
+        if end == -1:
+            end = size
+        if end - start >= unpacker.size:
+            yield unpacker.unpack_from(buffer, start)
+        else:
+            # Short line: pad it out so missing slots read as blank.
+            yield unpacker.unpack(buffer[start:end].ljust(unpacker.size))
+        start = end + 1
+
+
+def read_fixed_width(path: str, layout: FixedWidthLayout):
+    # Yields (episode id, codes) straight from the mapped file. Records are
+    # unpacked in place, so only the id and code fields are ever copied;
+    # blank slots and blank records are skipped.
+    if os.path.getsize(path) == 0:
+        return
+
+    unpacker, id_index, code_indices = _unpacker(layout)
+    first, last = (code_indices[0], code_indices[-1] + 1) if code_indices else (0, 0)
+    consecutive = code_indices == list(range(first, last))
+    encoding = layout.encoding
+    normalise = layout.normalise
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for fields in _unpacked(buffer, unpacker, layout.record_length):
+                episode_id = fields[id_index].strip()
+                if not episode_id:
+                    continue
+                # Codes never contain spaces, so one join and split drops
+                # the blank slots and the padding together.
+                if consecutive:
+                    codes = b" ".join(fields[first:last]).decode(encoding).split()
+                else:
+                    codes = b" ".join([fields[i] for i in code_indices])
+                    codes = codes.decode(encoding).split()
+                if normalise != None:
+                    codes = [normalise(code) for code in codes]
+                yield episode_id.decode(encoding), codes
@@ -0,0 +1,128 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Swapping rule sets in long running processes without a restart. A new
+# rule set is compiled and verified off to the side, then replaces the old
+# engine in one assignment; checks already running finish on the engine they
+# started with, and every result says which version produced it. Result
+# caches are keyed by ruleset hash, so nothing cached under the old rules is
+# returned for the new ones.
+
+import json
+import runpy
+import threading
+from concurrent.futures import Future
+
+from . import run
+from .compiler import Engine, get_engine
+
+
+def load_standards(path: str, type: str = "icd10") -> dict:
+    # A JSON object of standards, or a Python file defining
+    # <type>_standards_dict like standards.py.
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return runpy.run_path(path)["%s_standards_dict" % (type.lower())]
+
+
+def verify_engine(engine: Engine, n: int = 200, seed: int = 0):
+    # Raises ValueError if the engine disagrees with run() on episodes drawn
+    # from its own standards.
+    # Imported here: the test harness pulls in the pipeline and pandas.
+    from .testing import random_episodes
+
+    for icd10s in random_episodes(n=n, seed=seed, standards=engine.standards):
+        try:
+            expected = run(icd10s, standards_dict=engine.standards_dict)
+        except Exception:
+            continue
+        if engine.check(icd10s) != expected:
+            raise ValueError("Compiled rules disagree with run() on %r" % (icd10s))
+
+
+def _versioned(version, checked):
+    for episode_id, results in checked:
+        yield episode_id, version, results
+
+
+class ReloadableEngine:
+    def __init__(self, type: str = "icd10", standards: dict = None, version=None):
+        engine = get_engine(type) if standards == None else Engine(standards)
+        self._current = (version or engine.ruleset_hash[:12], engine)
+        self._reloading = threading.Lock()
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def engine(self) -> Engine:
+        return self._current[1]
+
+    def current(self) -> tuple:
+        # (version, engine), read together.
+        return self._current
+
+    def check(self, icd10s: list) -> tuple:
+        # (version, results)
+        version, engine = self._current
+        return version, engine.check(icd10s)
+
+    def check_batch(self, episodes, cache=None, batch_size: int = 500):
+        # Yields (episode id, version, results); the whole call uses the
+        # engine that was current when it was made, not when iteration
+        # starts.
+        version, engine = self._current
+        return _versioned(version, engine.check_batch(episodes, cache, batch_size))
+
+    def reload(
+        self, standards: dict, version=None, verify=verify_engine, background=True
+    ) -> Future:
+        # Compiles and verifies standards, then swaps them in. The Future
+        # resolves to the new version, or to the error that kept the old
+        # one in place. verify(engine) should raise to reject it.
+        future = Future()
+
+        def build():
+            try:
+                with self._reloading:
+                    engine = Engine(standards)
+                    if verify != None:
+                        verify(engine)
+                    current = (version or engine.ruleset_hash[:12], engine)
+                    self._current = current
+                future.set_result(current[0])
+            except BaseException as e:
+                future.set_exception(e)
+
+        if background:
+            threading.Thread(target=build, daemon=True).start()
+        else:
+            build()
+        return future
+
+    def reload_file(self, path: str, type: str = "icd10", **kwargs) -> Future:
+        return self.reload(load_standards(path, type), **kwargs)
@@ -0,0 +1,243 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# A compiled standards dict flattened into one read-only buffer, so several
+# worker processes can share a single copy through shared memory or an
+# mmap'd file instead of each building their own dict.
+#
+# Layout (native byte order, the pack never leaves the host):
+#   header | key offsets (count + 1) | entry offsets (count + 1) | keys | entries
+# Keys are the trigger codes, sorted, utf-8. Entries are the matching
+# standards_dict values as JSON, decoded on demand.
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+try:
+    import _posixshmem
+except ImportError:
+    _posixshmem = None
+
+from .check import _check_against_standard
+from .compiler import check_batch, ruleset_hash
+from .standards import _build_standards_dict
+from .utils import chunk_keys
+
+_MAGIC = b"CERP"
+_VERSION = 1
+_HEADER = struct.Struct("=4sHH64sI")
+
+
+def pack(standards: dict) -> bytes:
+    standards_dict = _build_standards_dict(standards)
+    triggers = sorted(standards_dict, key=lambda k: k.encode("utf-8"))
+
+    keys, entries = [], []
+    key_offsets, entry_offsets = array("I", [0]), array("I", [0])
+    for trigger in triggers:
+        keys.append(trigger.encode("utf-8"))
+        entries.append(
+            json.dumps(standards_dict[trigger], ensure_ascii=False).encode("utf-8")
+        )
+        key_offsets.append(key_offsets[-1] + len(keys[-1]))
+        entry_offsets.append(entry_offsets[-1] + len(entries[-1]))
+
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, 0, ruleset_hash(standards).encode("ascii"), len(triggers)
+    )
+    return b"".join(
+        [header, key_offsets.tobytes(), entry_offsets.tobytes()] + keys + entries
+    )
+
+
+class RulePack:
+    def __init__(self, buffer, cache_size: int = 256):
+        self._buffer = memoryview(buffer).toreadonly()
+        magic, version, _, digest, count = _HEADER.unpack_from(self._buffer)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a version %i rule pack" % (_VERSION))
+
+        self.ruleset_hash = digest.decode("ascii")
+        self._count = count
+
+        start = _HEADER.size
+        width = (count + 1) * 4
+        self._key_offsets = self._buffer[start : start + width].cast("I")
+        self._entry_offsets = self._buffer[start + width : start + 2 * width].cast("I")
+        self._keys = start + 2 * width
+        self._entries = self._keys + self._key_offsets[count]
+
+        # Only the keys are copied out of the buffer, so a code that is not
+        # a trigger costs one dict lookup; entries stay shared until used.
+        self._index = {}
+        self._sizes = set()
+        for i in range(count):
+            key = self._key(i).decode("utf-8")
+            self._index[key] = i
+            if "&" in key:
+                self._sizes.add(key.count("&") + 1)
+
+        self._decode = lru_cache(maxsize=cache_size)(self._decode_entry)
+        self._segment = None
+
+    def _key(self, i: int) -> bytes:
+        return bytes(
+            self._buffer[
+                self._keys
+                + self._key_offsets[i] : self._keys
+                + self._key_offsets[i + 1]
+            ]
+        )
+
+    def _decode_entry(self, i: int) -> dict:
+        start = self._entries + self._entry_offsets[i]
+        end = self._entries + self._entry_offsets[i + 1]
+        return json.loads(bytes(self._buffer[start:end]).decode("utf-8"))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, trigger: str) -> bool:
+        return trigger in self._index
+
+    def get(self, trigger: str):
+        i = self._index.get(trigger)
+        if i == None:
+            return None
+        return self._decode(i)
+
+    def check(self, icd10s: list) -> dict:
+        # Same walk as run(), fetching standards from the pack.
+        final_results = {}
+
+        for icd10 in icd10s:
+            if icd10 not in final_results:
+                final_results[icd10] = {}
+
+            if len(icd10) == 3:
+                returned_standard = self.get("%sX" % (icd10))
+                if returned_standard != None:
+                    final_results[icd10] = _check_against_standard(
+                        returned_standard, icd10s, icd10
+                    )
+
+            returned_standard = self.get(icd10)
+            if returned_standard != None:
+                final_results[icd10].update(
+                    _check_against_standard(returned_standard, icd10s, icd10)
+                )
+
+            if len(icd10) > 3:
+                returned_standard = self.get(icd10[0:3])
+                if returned_standard != None:
+                    final_results[icd10].update(
+                        _check_against_standard(returned_standard, icd10s, icd10)
+                    )
+
+        for icd10_chunk in chunk_keys(icd10s, self._sizes):
+            returned_standard = self.get(icd10_chunk)
+            if returned_standard != None:
+                final_results.setdefault(icd10_chunk, {}).update(
+                    _check_against_standard(returned_standard, icd10s, icd10_chunk)
+                )
+
+        return {k: v for k, v in final_results.items() if v != {}}
+
+    def check_batch(
+        self,
+        episodes,
+        cache=None,
+        batch_size: int = 500,
+        stats: dict = None,
+        max_codes: int = None,
+    ):
+        return check_batch(self, episodes, cache, batch_size, stats, max_codes)
+
+    def close(self):
+        self._decode.cache_clear()
+        self._key_offsets.release()
+        self._entry_offsets.release()
+        self._buffer.release()
+        if self._segment != None:
+            self._segment.close()
+
+
+def write_pack(path: str, standards: dict):
+    with open(path, "wb") as f:
+        f.write(pack(standards))
+
+
+def open_pack(path: str, cache_size: int = 256) -> RulePack:
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return RulePack(buffer, cache_size)
+
+
+def publish(standards: dict, name: str = None) -> shared_memory.SharedMemory:
+    # The caller owns the segment: close() and unlink() it once workers are done.
+    data = pack(standards)
+    segment = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    segment.buf[: len(data)] = data
+    return segment
+
+
+def _attach_segment(name: str):
+    # Readers never own the segment. Before 3.13 SharedMemory registers it
+    # with the resource tracker, which unlinks it for everyone when an
+    # unrelated reader exits; unregistering instead would drop the
+    # publisher's own registration when the tracker is shared. So the
+    # segment is mapped read-only without SharedMemory. Either way the
+    # result has buf and close().
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    if os.name != "posix":
+        return shared_memory.SharedMemory(name=name)
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY)
+    try:
+        buffer = mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    return _Mapped(buffer)
+
+
+class _Mapped:
+    def __init__(self, buffer: mmap.mmap):
+        self.buf = buffer
+
+    def close(self):
+        self.buf.close()
+
+
+def attach(name: str, cache_size: int = 256) -> RulePack:
+    segment = _attach_segment(name)
+    rule_pack = RulePack(segment.buf, cache_size)
+    rule_pack._segment = segment
+    return rule_pack
@@ -0,0 +1,168 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Spreading one input over several machines. Every episode belongs to one
+# of N shards by a hash of its id, so shard() only has to write a manifest
+# per shard naming it. Each node checks the full input through its
+# manifest, which blanks out the other shards' records, so the results keep
+# the record numbers of the whole input. merge() interleaves the nodes'
+# results back into record order, which is exactly what a single run over
+# the whole input writes, whatever order the files are given in.
+
+import csv
+import hashlib
+import heapq
+import json
+import os
+
+from .metrics import severity_counts
+from .utils import MAX_CODES_STANDARD
+
+
+def shard_of(id: str, shards: int) -> int:
+    # Not hash(), which changes from one process to the next.
+    digest = hashlib.blake2b(id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def _id(item):
+    # The episode id of a CSV line or an (episode id, codes) pair, as the
+    # pipeline would parse it; None for blank records.
+    if item == None:
+        return None
+    if not isinstance(item, str):
+        return item[0]
+    if '"' in item:
+        row = next(csv.reader([item]), [])
+        id = row[0] if row else ""
+    else:
+        id = item.split(",", 1)[0]
+    id = id.strip()
+    return id if id != "" else None
+
+
+class Manifest:
+    def __init__(self, shard: int, shards: int, size: int = None):
+        # size is the input's size in bytes, to catch a node checking a
+        # different file.
+        self.shard = shard
+        self.shards = shards
+        self.size = size
+
+    @classmethod
+    def from_json(cls, path: str) -> "Manifest":
+        with open(path) as file:
+            manifest = json.load(file)
+        return cls(manifest["shard"], manifest["shards"], manifest.get("size"))
+
+    def to_json(self, path: str):
+        with open(path, "w") as file:
+            json.dump(
+                {"shard": self.shard, "shards": self.shards, "size": self.size}, file
+            )
+
+    def check_input(self, path: str):
+        if self.size != None and os.path.getsize(path) != self.size:
+            raise ValueError(
+                "Shard %i of %i is for an input of %i bytes, %s has %i"
+                % (self.shard, self.shards, self.size, path, os.path.getsize(path))
+            )
+
+    def select(self, source, blank=""):
+        # The source with every record outside the shard replaced by blank:
+        # "" for CSV lines, None for (episode id, codes) pairs.
+        for item in source:
+            id = _id(item)
+            if id != None and shard_of(id, self.shards) == self.shard:
+                yield item
+            else:
+                yield blank
+
+
+def shard(input_path: str, shards: int, directory: str) -> list:
+    # Writes directory/shard-00000.json etc. and returns their paths.
+    size = os.path.getsize(input_path)
+    paths = []
+    for index in range(shards):
+        path = os.path.join(directory, "shard-%05i.json" % (index))
+        Manifest(index, shards, size).to_json(path)
+        paths.append(path)
+    return paths
+
+
+def _record(line: str) -> int:
+    # format_jsonl lines start with the record number.
+    if line.startswith('{"record": '):
+        return int(line[11 : line.index(",", 11)])
+    return json.loads(line)["record"]
+
+
+def _keyed(path: str):
+    with open(path, newline="") as file:
+        for line in file:
+            yield _record(line), line
+
+
+def _add(line: str, counts: dict):
+    results = json.loads(line)["results"]
+    counts["episodes"] += 1
+    severity_counts(results, counts)
+    if MAX_CODES_STANDARD in results.get("*", {}):
+        counts["limited"] += 1
+
+
+def count(lines) -> dict:
+    # Totals for result lines: episodes, failures by severity and episodes
+    # over max_codes. The same for a merged output as for a single run's.
+    counts = {"episodes": 0, "limited": 0}
+    for line in lines:
+        _add(line, counts)
+    return counts
+
+
+def _merged(paths: list):
+    # Each shard's results are already in record order, so one pass over
+    # them all in step puts the whole in record order.
+    last = None
+    for record, line in heapq.merge(*[_keyed(path) for path in paths]):
+        if record == last:
+            raise ValueError("Record %i is in more than one result file" % (record))
+        last = record
+        yield line
+
+
+def merge(paths: list, output_path: str, counts_path: str = None) -> dict:
+    # Writes the shards' results as one file, and their totals (see count)
+    # to counts_path as sorted JSON.
+    counts = {"episodes": 0, "limited": 0}
+    with open(output_path, "w", newline="") as output:
+        for line in _merged(paths):
+            output.write(line)
+            _add(line, counts)
+    if counts_path != None:
+        with open(counts_path, "w") as file:
+            json.dump(counts, file, indent=2, sort_keys=True)
+            file.write("\n")
+    return counts
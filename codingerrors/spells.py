@@ -0,0 +1,77 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Some standards apply across a hospital spell rather than a single
+# consultant episode, e.g. a birth outcome (Z37) with its delivery code (O30)
+# recorded in another episode of the same spell. check_spells reads episodes
+# sorted by spell, checks each episode against the episode level standards
+# and each whole spell against the spell level ones, in one pass.
+
+from .compiler import get_engine
+from .standards import _standards_for
+
+# Standard keys checked against a spell's codes instead of each episode's.
+SPELL_STANDARDS = {
+    "ICD10": ["DCS.XV.9:0:E", "DCS.XV.14:0:E"],
+    "OPCS4": [],
+}
+
+
+def split_standards(standards: dict, spell_keys: list) -> tuple:
+    # (episode level, spell level) standards dicts, in their original order.
+    spell_keys = set(spell_keys)
+    episode = {k: v for k, v in standards.items() if k not in spell_keys}
+    spell = {k: v for k, v in standards.items() if k in spell_keys}
+    return episode, spell
+
+
+def check_spells(
+    episodes, type: str = "icd10", standards: dict = None, spell_keys: list = None
+):
+    # episodes: iterable of (spell id, episode id, codes), sorted by spell id.
+    # Yields (spell id, [(episode id, results)], spell results) per spell,
+    # where spell results are for the spell's codes in episode order.
+    if standards == None:
+        standards = _standards_for(type)
+    if spell_keys == None:
+        spell_keys = SPELL_STANDARDS.get(type.upper(), [])
+
+    episode_standards, spell_standards = split_standards(standards, spell_keys)
+    episode_engine = get_engine(standards=episode_standards)
+    spell_engine = get_engine(standards=spell_standards)
+
+    current, checked, codes = None, [], []
+    for spell_id, episode_id, icd10s in episodes:
+        if spell_id != current:
+            if current != None and spell_id < current:
+                raise ValueError("Episodes are not sorted by spell id")
+            if checked:
+                yield current, checked, spell_engine.check(codes)
+            current, checked, codes = spell_id, [], []
+        checked.append((episode_id, episode_engine.check(icd10s)))
+        codes.extend(icd10s)
+
+    if checked:
+        yield current, checked, spell_engine.check(codes)
@@ -0,0 +1,122 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Check episodes staged in SQLite and write the failures back to a table,
+# streaming both ways so nothing is held in memory beyond one batch.
+
+import re
+import time
+
+from .compiler import get_engine
+from .utils import failures, normalise
+
+
+def _identifier(name: str) -> str:
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        raise ValueError("Not a valid table name: %r" % (name))
+    return name
+
+
+def _episodes(cursor, batch_size: int):
+    # Rows are (episode id, code, code, ...); NULL or blank codes are skipped.
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            codes = [normalise(code) for code in row[1:] if code != None]
+            yield row[0], [code for code in codes if code != ""]
+
+
+def _indexes(table: str) -> dict:
+    return {
+        "%s_episode" % (table): "episode_id, standard, operator",
+        "%s_standard" % (table): "standard, operator",
+    }
+
+
+def check_sqlite(
+    connection,
+    query: str,
+    params=(),
+    type: str = "icd10",
+    engine=None,
+    results_table: str = "coding_errors",
+    batch_size: int = 1000,
+    replace: bool = False,
+) -> dict:
+    # Episodes come from query via fetchmany. Failures go into results_table,
+    # one transaction per batch, with its indexes dropped during the load
+    # and rebuilt once at the end. A failure already in the table for the
+    # same episode, code, standard and operator is replaced, so rerunning a
+    # query does not duplicate rows; replace=True empties the table first.
+    engine = engine or get_engine(type)
+    table = _identifier(results_table)
+    start = time.perf_counter()
+
+    if replace:
+        connection.execute("DROP TABLE IF EXISTS %s" % (table))
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS %s ("
+        "episode_id, code TEXT, standard TEXT, operator TEXT, note TEXT, "
+        "PRIMARY KEY (episode_id, code, standard, operator))" % (table)
+    )
+    for index in _indexes(table):
+        connection.execute("DROP INDEX IF EXISTS %s" % (index))
+    connection.commit()
+
+    insert = (
+        "INSERT OR REPLACE INTO %s (episode_id, code, standard, operator, note) "
+        "VALUES (?, ?, ?, ?, ?)" % (table)
+    )
+    stats = {"episodes": 0, "failing_episodes": 0, "failures": 0, "batches": 0}
+    pending = []
+    # The query is read and the failures written through separate cursors.
+    reader, writer = connection.cursor(), connection.cursor()
+
+    def flush():
+        writer.executemany(insert, pending)
+        connection.commit()
+        stats["failures"] += len(pending)
+        stats["batches"] += 1
+        pending.clear()
+
+    reader.execute(query, params)
+    for episode_id, results in engine.check_batch(_episodes(reader, batch_size)):
+        stats["episodes"] += 1
+        if results != {}:
+            stats["failing_episodes"] += 1
+            for code, standard, operator, failure in failures(results):
+                pending.append((episode_id, code, standard, operator, failure["note"]))
+        if stats["episodes"] % batch_size == 0:
+            flush()
+    flush()
+
+    for index, columns in _indexes(table).items():
+        connection.execute("CREATE INDEX %s ON %s (%s)" % (index, table, columns))
+    connection.commit()
+
+    stats["seconds"] = round(time.perf_counter() - start, 6)
+    return stats
@@ -1147,3 +1147,17 @@ def _build_standards_dict(standards_dict: dict = icd10_standards_dict) -> dict:
                         compiled_standards_dict[code][key] = {}
                     compiled_standards_dict[code][key][part[0]] = dehyphyed
     return compiled_standards_dict
+
+
+def _severity(key: str) -> str:
+    # "DCS.X.5:0:E" -> "E"
+    return key.rsplit(":", 1)[-1].strip()
+
+
+def _standards_for(type: str) -> dict:
+    # The built in standards for "icd10" or "opcs4".
+    if type.upper() == "ICD10":
+        return icd10_standards_dict
+    elif type.upper() == "OPCS4":
+        return opcs4_standards_dict
+    raise ValueError("Unknown standards type: %s" % (type))
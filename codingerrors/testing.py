@@ -0,0 +1,247 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import io
+import json
+import random
+import time
+
+from . import run
+from .cache import ResultCache
+from .compiler import get_engine
+from .gate import is_clean, first_failure
+from .pipeline import Pipeline
+from .rulepack import RulePack, pack
+from .standards import _build_standards_dict, _severity, _standards_for
+from .utils import failures
+
+try:
+    from .dataframe import check_frame, pd
+except ImportError:
+    check_frame = None
+
+
+def _code_pool(standards_dict: dict) -> tuple:
+    codes, combinations = set(), []
+    for trigger, returned_standard in standards_dict.items():
+        if "&" in trigger:
+            combinations.append(trigger.split("&"))
+        else:
+            codes.add(trigger)
+        for rules in returned_standard.values():
+            for values in rules.values():
+                if isinstance(values, list):
+                    codes.update(values)
+    # Some OPCS-4 rule lists hold "", which is not a code anyone could enter.
+    codes.discard("")
+    return sorted(codes), combinations
+
+
+def random_episodes(
+    type: str = "icd10",
+    n: int = 1000,
+    seed: int = 0,
+    max_codes: int = 12,
+    standards: dict = None,
+) -> list:
+    # Episodes drawn mostly from codes the standards mention, so rules fire
+    # often, with some unrelated codes, repeats and A&B combinations mixed in.
+    # standards overrides the built in set for type.
+    rng = random.Random(seed)
+    if standards == None:
+        standards = _standards_for(type)
+    codes, combinations = _code_pool(_build_standards_dict(standards))
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+    def code():
+        if rng.random() < 0.15:
+            return "%s%02i%s" % (
+                rng.choice(letters),
+                rng.randint(0, 99),
+                rng.randint(0, 9),
+            )
+        c = rng.choice(codes)
+        if c.endswith("X"):
+            return c[:-1]
+        if len(c) == 3 and rng.random() < 0.6:
+            return c + str(rng.randint(0, 9))
+        return c
+
+    episodes = []
+    for _ in range(n):
+        episode = [code() for _ in range(rng.randint(1, max_codes))]
+        if rng.random() < 0.05:
+            episode.append(rng.choice(episode))
+        if combinations and rng.random() < 0.05:
+            at = rng.randint(0, len(episode))
+            episode[at:at] = rng.choice(combinations)
+        episodes.append(episode)
+    return episodes
+
+
+def _clean(result: dict, severity: str = "E") -> bool:
+    return not any(
+        _severity(standard) == severity
+        for standards in result.values()
+        for standard in standards
+    )
+
+
+def _agrees_first_failure(result: dict, found) -> bool:
+    if found == None:
+        return result == {}
+    return found[1] in result.get(found[0], {})
+
+
+def _engine_check(type: str, episodes: list) -> list:
+    engine = get_engine(type)
+    return [engine.check(e) for e in episodes]
+
+
+def _rulepack_check(type: str, episodes: list) -> list:
+    rule_pack = RulePack(pack(_standards_for(type)))
+    return [rule_pack.check(e) for e in episodes]
+
+
+def _cached_check(type: str, episodes: list) -> list:
+    # Half the episodes are cached first so results come from both the cache
+    # and the engine.
+    engine = get_engine(type)
+    cache = ResultCache(":memory:")
+    try:
+        list(engine.check_batch(enumerate(episodes[::2]), cache))
+        return [
+            results for _, results in engine.check_batch(enumerate(episodes), cache)
+        ]
+    finally:
+        cache.close()
+
+
+def _batch_check(type: str, episodes: list) -> list:
+    # Every third episode again in the same batch, so some results are
+    # shared between episodes.
+    numbered = list(enumerate(episodes))
+    numbered += numbered[::3]
+    checked = dict(get_engine(type).check_batch(numbered, None, len(numbered)))
+    return [checked[i] for i in range(len(episodes))]
+
+
+def _pipeline_check(type: str, episodes: list) -> list:
+    output = io.StringIO()
+    Pipeline(type, workers=1, batch_size=50, parse=None).run(
+        ((str(i), episode) for i, episode in enumerate(episodes)), output
+    )
+    return [json.loads(line)["results"] for line in output.getvalue().splitlines()]
+
+
+def _failures(results: dict) -> list:
+    return sorted(failure[:3] for failure in failures(results))
+
+
+def _frame_check(type: str, episodes: list) -> list:
+    # One column per code slot, with the failures of each row.
+    width = max(len(episode) for episode in episodes)
+    df = pd.DataFrame(
+        [list(episode) + [None] * (width - len(episode)) for episode in episodes]
+    )
+    found = [[] for _ in episodes]
+    for row in check_frame(df, type=type).itertuples(index=False):
+        found[row.row].append((row.code, row.standard, row.operator))
+    return [sorted(failures) for failures in found]
+
+
+def _engine_first_failure(type: str, episodes: list) -> list:
+    engine = get_engine(type)
+    return [engine.first_failure(e) for e in episodes]
+
+
+# name: (check(type, episodes) -> outputs, agrees(reference, output) -> bool)
+PATHS = {
+    "engine": (_engine_check, lambda result, output: result == output),
+    "is_clean": (
+        lambda type, episodes: [is_clean(e, type=type) for e in episodes],
+        lambda result, output: _clean(result) == output,
+    ),
+    "first_failure": (
+        lambda type, episodes: [first_failure(e, type=type) for e in episodes],
+        _agrees_first_failure,
+    ),
+    "engine.first_failure": (_engine_first_failure, _agrees_first_failure),
+    "rulepack": (_rulepack_check, lambda result, output: result == output),
+    "cache": (_cached_check, lambda result, output: result == output),
+    "batch": (_batch_check, lambda result, output: result == output),
+    "pipeline": (_pipeline_check, lambda result, output: result == output),
+}
+if check_frame != None:
+    PATHS["dataframe"] = (
+        _frame_check,
+        lambda result, output: _failures(result) == output,
+    )
+
+
+def differential(
+    type: str = "icd10", episodes: list = None, paths: list = None
+) -> dict:
+    # Runs episodes through run() and each fast path. Returns per path the
+    # episodes/s and every (episode, expected, output) that disagreed.
+    if episodes == None:
+        episodes = random_episodes(type)
+    standards_dict = _build_standards_dict(_standards_for(type))
+
+    # Some sequences make run() itself raise; those can't be compared.
+    reference, checked = [], []
+    start = time.perf_counter()
+    for episode in episodes:
+        try:
+            reference.append(run(episode, standards_dict=standards_dict))
+        except Exception:
+            continue
+        checked.append(episode)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "run": {
+            "episodes_per_second": len(episodes) / elapsed,
+            "errors": len(episodes) - len(checked),
+        }
+    }
+
+    for name in paths or PATHS:
+        check, agrees = PATHS[name]
+        # Warm up so compile time isn't counted as throughput.
+        check(type, checked[:1])
+        start = time.perf_counter()
+        outputs = check(type, checked)
+        elapsed = time.perf_counter() - start
+
+        report[name] = {
+            "episodes_per_second": len(checked) / elapsed,
+            "mismatches": [
+                (episode, result, output)
+                for episode, result, output in zip(checked, reference, outputs)
+                if not agrees(result, output)
+            ],
+        }
+    return report
@@ -46,4 +46,65 @@ def chunks(l, n: int = None):
     if n == None:
         n = len(l)
     return list(zip_longest(*[iter(l)]*n, fillvalue=None))
-    
\ No newline at end of file
+
+
+def trigger_keys(code: str) -> list:
+    # The standards_dict keys run() looks up for a single code, in order.
+    if len(code) == 3:
+        return ["%sX" % (code), code]
+    elif len(code) > 3:
+        return [code, code[0:3]]
+    return [code]
+
+
+def chunk_keys(l: list, sizes: set) -> list:
+    # Same keys as joining every chunk() of every size in run(), but only
+    # for the sizes that a combination standard (A&B) can actually have.
+    keys = []
+    length = len(l)
+    for n in range(length, 1, -1):
+        tail = length % n
+        if n in sizes:
+            for i in range(0, length - tail, n):
+                keys.append("&".join(l[i : i + n]))
+        if tail > 1 and tail in sizes:
+            keys.append("&".join(l[length - tail :]))
+    return keys
+
+
+def failures(results: dict):
+    # Flattens run() output into (code, standard, operator, failure) rows.
+    # The € rule stores its failure directly under the standard.
+    for code, standards in results.items():
+        for standard, rules in standards.items():
+            if "pass" in rules:
+                yield code, standard, "€", rules
+                continue
+            for operator, failure in rules.items():
+                yield code, standard, operator, failure
+
+
+# Standard key of the result given to episodes over a max_codes limit.
+MAX_CODES_STANDARD = "MAX.CODES:0:E"
+
+
+def too_many_codes(count: int, max_codes: int) -> dict:
+    # In place of results for an episode that was not checked, under the
+    # pseudo code "*", so it reads as one error-severity failure.
+    return {
+        "*": {
+            MAX_CODES_STANDARD: {
+                "#": {
+                    "pass": False,
+                    "relevant": [],
+                    "note": "%i codes is over the limit of %i; not checked"
+                    % (count, max_codes),
+                }
+            }
+        }
+    }
+
+
+def normalise(code: str) -> str:
+    # " j44.0 " -> "J440"
+    return code.strip().replace(".", "").upper()
@@ -20,4 +20,6 @@ setup(
     author_email="keiron.oshea@wales.nhs.uk",
     packages=find_packages(),
     include_package_data=True,
+    entry_points={"console_scripts": ["codingerrors=codingerrors.cli:main"]},
+    extras_require={"pandas": ["pandas"]},
 )
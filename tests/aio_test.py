@@ -0,0 +1,120 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from codingerrors import run
+from codingerrors.aio import check_stream
+from codingerrors.testing import random_episodes
+
+EPISODES = random_episodes(n=200, seed=40)
+
+
+async def producer(episodes):
+    for i, codes in enumerate(episodes):
+        await asyncio.sleep(0)
+        yield i, codes
+
+
+async def collect(source, **kwargs) -> list:
+    return [checked async for checked in check_stream(source, **kwargs)]
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(4)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        future = super().submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.running -= 1
+
+
+class TestCheckStream(unittest.TestCase):
+    def test_matches_run(self):
+        checked = asyncio.run(collect(producer(EPISODES), batch_size=16))
+        self.assertEqual([i for i, _ in checked], list(range(len(EPISODES))))
+        for i, results in checked:
+            self.assertEqual(results, run(EPISODES[i]))
+
+    def test_window(self):
+        # The producer waits for results of what it has sent so far, so only
+        # the time window can release the first batch.
+        async def main():
+            received = asyncio.Event()
+
+            async def waiting_producer():
+                for i in range(3):
+                    yield i, ["J440", "J22"]
+                await received.wait()
+                yield 3, ["D64"]
+
+            checked = []
+            async for result in check_stream(
+                waiting_producer(), batch_size=100, window=0.01
+            ):
+                checked.append(result)
+                if len(checked) == 3:
+                    received.set()
+            return checked
+
+        checked = asyncio.run(asyncio.wait_for(main(), 10))
+        self.assertEqual([i for i, _ in checked], [0, 1, 2, 3])
+
+    def test_in_flight_bounded(self):
+        executor = CountingExecutor()
+        try:
+            checked = asyncio.run(
+                collect(
+                    producer(EPISODES),
+                    batch_size=8,
+                    max_in_flight=2,
+                    executor=executor,
+                )
+            )
+        finally:
+            executor.shutdown()
+        self.assertEqual(len(checked), len(EPISODES))
+        self.assertLessEqual(executor.most, 2)
+
+    def test_source_errors(self):
+        async def failing():
+            yield 0, ["J440"]
+            raise ValueError("bad message")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(failing()))
@@ -0,0 +1,103 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.cache import ResultCache
+from codingerrors.cli import main
+from codingerrors.compiler import get_engine
+from codingerrors.pipeline import Pipeline
+
+EPISODES = [["J440", "J22"], ["D64"], ["F100", "T36"], ["J440", "J22"]]
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        cache = ResultCache(self.path)
+        self.assertEqual(cache.get("a", ["J440", "J22"]), None)
+        cache.put("a", ["J440", "J22"], run(["J440", "J22"]))
+        self.assertEqual(cache.get("a", ["J440", "J22"]), run(["J440", "J22"]))
+        # Keyed by ruleset and code order.
+        self.assertEqual(cache.get("b", ["J440", "J22"]), None)
+        self.assertEqual(cache.get("a", ["J22", "J440"]), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.close()
+
+    def test_check_batch(self):
+        engine = get_engine("icd10")
+        cache = ResultCache(self.path)
+        first = list(engine.check_batch(enumerate(EPISODES), cache, batch_size=2))
+        # The repeated episode is in the second batch, after the first was stored.
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        second = list(engine.check_batch(enumerate(EPISODES), cache, batch_size=2))
+        self.assertEqual((cache.hits, cache.misses), (5, 3))
+        self.assertEqual(first, second)
+        self.assertEqual([results for _, results in second], [run(e) for e in EPISODES])
+        cache.close()
+
+    def test_compact(self):
+        cache = ResultCache(self.path)
+        cache.put("old", ["D64"], {})
+        cache.put("new", ["D64"], {})
+        self.assertEqual(cache.compact(["new"]), 1)
+        self.assertEqual(cache.stats()["rulesets"], {"new": 1})
+        cache.close()
+
+    def test_pipeline(self):
+        lines = ["EP%d,%s\n" % (i, ",".join(codes)) for i, codes in enumerate(EPISODES)]
+        for workers in (0, 1):
+            outputs = []
+            for _ in range(2):
+                output = io.StringIO()
+                stats = Pipeline(workers=workers, cache=self.path).run(lines, output)
+                outputs.append(output.getvalue())
+            self.assertEqual(outputs[0], outputs[1])
+            # The repeated episode is checked once per batch.
+            self.assertEqual(stats["cache"], {"hits": 3, "misses": 0})
+            results = [json.loads(line)["results"] for line in outputs[1].splitlines()]
+            self.assertEqual(results, [run(e) for e in EPISODES])
+
+    def test_cli_compact(self):
+        cache = ResultCache(self.path)
+        cache.put("old", ["D64"], {})
+        cache.put(get_engine("icd10").ruleset_hash, ["D64"], {})
+        cache.close()
+        self.assertEqual(main(["cache", "compact", self.path]), 0)
+        cache = ResultCache(self.path)
+        self.assertEqual(
+            cache.stats()["rulesets"], {get_engine("icd10").ruleset_hash: 1}
+        )
+        cache.close()
@@ -0,0 +1,173 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import tempfile
+import unittest
+from codingerrors.checkpoint import Checkpoint
+from codingerrors.cli import main
+from codingerrors.pipeline import Pipeline
+
+CODES = ["J440", "J22", "D64", "F100", "T36", "O800", "Z370", "S720"]
+LINES = [
+    (
+        "EP%i,%s,%s\n" % (i, CODES[i % len(CODES)], CODES[i * 3 % len(CODES)])
+        if i % 7
+        else "\n"
+    )
+    for i in range(200)
+]
+
+
+def _crashing(lines: list, after: int):
+    for i, line in enumerate(lines):
+        if i == after:
+            raise RuntimeError("crashed")
+        yield line
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, "in.csv")
+        with open(self.input, "w") as file:
+            file.writelines(LINES)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def _expected(self, batch_size: int = 500):
+        stats = Pipeline(workers=0, batch_size=batch_size).run_file(
+            self.input, self._path("expected.jsonl")
+        )
+        with open(self._path("expected.jsonl"), "rb") as file:
+            return file.read(), stats
+
+    def test_resume_writes_exactly_once(self):
+        expected, expected_stats = self._expected(10)
+        output = self._path("out.jsonl")
+        for workers in (0, 1):
+            pipeline = Pipeline(workers=workers, batch_size=10, queue_size=2)
+            checkpoint = Checkpoint(output, 30, self.input)
+            checkpoint.reset()
+            with self.assertRaises(RuntimeError):
+                pipeline.run(_crashing(LINES, 125), None, checkpoint)
+            self.assertFalse(os.path.exists(output))
+
+            checkpoint = Checkpoint(output, 30, self.input)
+            self.assertTrue(checkpoint.resume())
+            self.assertGreater(checkpoint.record, 0)
+            self.assertLessEqual(checkpoint.record, 125)
+            self.assertEqual(len(checkpoint.parts), checkpoint.record // 30)
+            resumed = checkpoint.record
+            stats = pipeline.run_file(self.input, output, checkpoint)
+
+            with open(output, "rb") as file:
+                self.assertEqual(file.read(), expected)
+            self.assertEqual(stats["episodes"], expected_stats["episodes"])
+            self.assertEqual(stats["dedup"], expected_stats["dedup"])
+            self.assertEqual(stats["resumed_from"], resumed)
+            self.assertEqual(
+                sorted(os.listdir(self.directory.name)),
+                ["expected.jsonl", "in.csv", "out.jsonl"],
+            )
+            os.remove(output)
+
+    def test_uncommitted_parts_are_dropped(self):
+        output = self._path("out.jsonl")
+        checkpoint = Checkpoint(output, 50)
+        checkpoint.write("committed\n")
+        checkpoint.commit(50, 1, {"episodes": 1})
+        checkpoint.write("lost\n")
+        checkpoint.commit(100, 2, {"episodes": 2})
+        # As if the run died between renaming a part and saving the
+        # checkpoint naming it.
+        with open(checkpoint.path, "w") as file:
+            json.dump(
+                {
+                    "input": None,
+                    "record": 50,
+                    "episodes": 1,
+                    "counts": {"episodes": 1},
+                    "parts": ["out.jsonl.part-00000"],
+                },
+                file,
+            )
+        open(output + ".part-00002.tmp", "w").close()
+
+        checkpoint = Checkpoint(output, 50)
+        self.assertTrue(checkpoint.resume())
+        self.assertEqual((checkpoint.record, checkpoint.counts), (50, {"episodes": 1}))
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            ["in.csv", "out.jsonl.checkpoint", "out.jsonl.part-00000"],
+        )
+        checkpoint.write("again\n")
+        checkpoint.commit(100, 2, {"episodes": 2})
+        checkpoint.finish()
+        with open(output) as file:
+            self.assertEqual(file.read(), "committed\nagain\n")
+
+    def test_other_input(self):
+        output = self._path("out.jsonl")
+        Checkpoint(output, 50, self.input).commit(0, 0, {})
+        with open(self.input, "a") as file:
+            file.write("EP9,J440\n")
+        with self.assertRaises(ValueError):
+            Checkpoint(output, 50, self.input).resume()
+
+    def test_resume_without_checkpoint(self):
+        expected, _ = self._expected()
+        output = self._path("out.jsonl")
+        main(["check", self.input, output, "--workers", "0", "--resume"])
+        with open(output, "rb") as file:
+            self.assertEqual(file.read(), expected)
+
+    def test_cli_resume(self):
+        expected, _ = self._expected()
+        output = self._path("out.jsonl")
+        checkpoint = Checkpoint(output, 40, self.input)
+        with self.assertRaises(RuntimeError):
+            Pipeline(workers=0, batch_size=20).run(
+                _crashing(LINES, 150), None, checkpoint
+            )
+        main(
+            [
+                "check",
+                self.input,
+                output,
+                "--workers",
+                "0",
+                "--checkpoint-every",
+                "40",
+                "--resume",
+            ]
+        )
+        with open(output, "rb") as file:
+            self.assertEqual(file.read(), expected)
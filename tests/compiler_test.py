@@ -0,0 +1,126 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import random
+import unittest
+from codingerrors import run
+from codingerrors.compiler import Engine, get_engine, ruleset_hash
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+
+
+class TestCompiler(unittest.TestCase):
+    def test_engine_is_cached_per_ruleset(self):
+        self.assertIs(get_engine("icd10"), get_engine("ICD10"))
+        self.assertIs(get_engine("icd10"), get_engine(standards=icd10_standards_dict))
+        self.assertIsNot(get_engine("icd10"), get_engine("opcs4"))
+
+    def test_ruleset_hash(self):
+        standards = {"A:0:E": "?J440:!J22", "B:0:E": "?M16:!M17"}
+        reordered = {"B:0:E": "?M16:!M17", "A:0:E": "?J440:!J22"}
+        self.assertEqual(ruleset_hash(standards), ruleset_hash(dict(standards)))
+        self.assertNotEqual(ruleset_hash(standards), ruleset_hash(reordered))
+
+    def test_matches_interpreter(self):
+        engine = get_engine("icd10")
+        for codes in (
+            ["J440", "J22"],
+            ["F100", "T36"],
+            ["F100", "T36", "T510"],
+            ["U071", "B972"],
+            ["P072", "P073"],
+            ["M4798"],
+            ["D64", "C90", "D64"],
+        ):
+            self.assertEqual(engine.check(codes), run(codes))
+
+        engine = get_engine("opcs4")
+        for codes in (["Y001"], ["L703", "Y524", "Y532", "Z378"], ["C751"]):
+            self.assertEqual(engine.check(codes), run(codes, type="opcs4"))
+
+    def test_differential_random(self):
+        engine = get_engine("icd10")
+        standards_dict = _build_standards_dict(icd10_standards_dict)
+        pool = sorted(c for c in standards_dict if "&" not in c)
+        rng = random.Random(26)
+        for _ in range(300):
+            codes = [rng.choice(pool).rstrip("X") for _ in range(rng.randint(1, 6))]
+            self.assertEqual(
+                engine.check(codes), run(codes, standards_dict=standards_dict)
+            )
+
+    def test_exclusion_groups(self):
+        engine = get_engine("icd10")
+        self.assertIn("# DCS.XIV.2:1:E, DCS.XIV.2:3:E", engine.source)
+        family = ["N181", "N182", "N185", "M160", "M171", "M19", "E109", "E119"]
+        rng = random.Random(36)
+        for _ in range(300):
+            codes = rng.sample(family, rng.randint(1, 4)) + ["J22"]
+            rng.shuffle(codes)
+            self.assertEqual(engine.check(codes), run(codes))
+
+        # Groups only cover standards with a single ! rule.
+        engine = Engine(
+            {
+                "A:0:E": "?J440:!J22,J45",
+                "A:1:E": "?J440:!J45,J22",
+                "A:2:E": "?J440:!J46:@J45",
+            }
+        )
+        self.assertIn("# A:0:E, A:1:E", engine.source)
+        for codes in (["J440", "J22", "J45"], ["J440", "J46"], ["J440", "J45", "J46"]):
+            self.assertEqual(
+                engine.check(codes),
+                run(codes, standards_dict=engine.standards_dict),
+            )
+
+    def test_check_batch_dedup(self):
+        engine = get_engine("icd10")
+        episodes = [
+            ("EP1", ["J440", "J22"]),
+            ("EP2", ["D64"]),
+            ("EP3", ["J440", "J22"]),
+        ]
+        stats = {}
+        checked = list(engine.check_batch(episodes, stats=stats))
+        self.assertEqual([id for id, _ in checked], ["EP1", "EP2", "EP3"])
+        self.assertEqual([r for _, r in checked], [run(c) for _, c in episodes])
+        self.assertIs(checked[0][1], checked[2][1])
+        self.assertEqual(stats, {"episodes": 3, "distinct": 2})
+
+        # Only within a batch.
+        stats = {}
+        list(engine.check_batch(episodes, batch_size=2, stats=stats))
+        self.assertEqual(stats, {"episodes": 3, "distinct": 3})
+
+    def test_custom_standards(self):
+        engine = Engine({"LOCAL:0:E": "?J440:!J22:@J45"})
+        self.assertNotEqual(engine.check(["J440", "J22"]), {})
+        self.assertEqual(engine.check(["J440", "J22", "J45"]), {})
+        self.assertFalse(engine.is_clean(["J440", "J22"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import unittest
+from codingerrors import run
+from codingerrors.conflicts import conflicts_for
+from codingerrors.testing import random_episodes
+from codingerrors.utils import failures
+
+
+class TestConflicts(unittest.TestCase):
+    def test_pairs(self):
+        # Both directions.
+        self.assertEqual(
+            conflicts_for("I10", ["R030"]), [("R030", "DChS.XVIII.1:0:E", "!")]
+        )
+        self.assertEqual(
+            conflicts_for("R030", ["I10"]), [("I10", "DChS.XVIII.1:0:E", "!")]
+        )
+        # Only directly after.
+        self.assertEqual(
+            conflicts_for("B972", ["U071"]), [("U071", "DSC.XXII.5:COVID-19:0:W", ">")]
+        )
+        self.assertEqual(conflicts_for("B972", ["U071", "J22"]), [])
+        # Ranges and three character values, in order.
+        self.assertEqual(
+            conflicts_for("S061", ["S020"]), [("S020", "DCS.XIX.1:E", "£")]
+        )
+        self.assertEqual(conflicts_for("S020", ["S061"]), [])
+
+    def test_exceptions(self):
+        self.assertEqual(
+            conflicts_for("T36", ["F100"]), [("F100", "DCS.XIX.8:0:E", "!")]
+        )
+        self.assertEqual(conflicts_for("T36", ["F100", "T510"]), [])
+
+    def test_without_entered_code(self):
+        self.assertEqual(conflicts_for("U075", []), [(None, "DCS.XXII.11:0:E", "€")])
+        self.assertEqual(conflicts_for("U075", ["J22", "U071"]), [])
+        self.assertEqual(
+            conflicts_for("E851", ["E423"], type="opcs4"), [("E423", "PCSE5:0:E", "/")]
+        )
+
+    def test_agrees_with_run(self):
+        # Every conflict reported is a failure run() reports once the
+        # candidate is coded.
+        for episode in random_episodes(n=300, seed=4):
+            if len(episode) < 2:
+                continue
+            conflicts = conflicts_for(episode[-1], episode[:-1])
+            if conflicts:
+                failed = {standard for _, standard, _, _ in failures(run(episode))}
+                for code, standard, rule in conflicts:
+                    self.assertIn(standard, failed)
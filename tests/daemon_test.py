@@ -0,0 +1,96 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import socket
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.compiler import get_engine
+from codingerrors.daemon import Client, Daemon, _frame, _read_frame
+
+EPISODES = [["J440", "J22"], ["D64"], ["F100", "T36"], ["U071", "B972"]]
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "codingerrors.sock")
+        self.daemon = Daemon(self.path).start()
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.directory.cleanup()
+
+    def test_check(self):
+        with Client(self.path) as client:
+            self.assertEqual(client.check(EPISODES[0]), run(EPISODES[0]))
+            self.assertEqual(client.check_batch(EPISODES), [run(e) for e in EPISODES])
+            self.assertEqual(
+                client.check(["Y001"], type="opcs4"), run(["Y001"], type="opcs4")
+            )
+            self.assertEqual(client.ping()["icd10"], get_engine("icd10").ruleset_hash)
+
+    def test_pipelined(self):
+        batches = [EPISODES[i:] for i in range(len(EPISODES))]
+        with Client(self.path) as client:
+            checked = list(client.check_pipelined(batches, depth=2))
+            self.assertEqual(checked, [[run(e) for e in batch] for batch in batches])
+
+            # Stopping early leaves the connection usable.
+            pipelined = client.check_pipelined(batches, depth=2)
+            next(pipelined)
+            pipelined.close()
+            self.assertEqual(client.check(EPISODES[0]), run(EPISODES[0]))
+
+    def test_errors(self):
+        with Client(self.path) as client:
+            with self.assertRaises(RuntimeError):
+                client.check(["J440"], type="icd11")
+            self.assertEqual(client.check(EPISODES[1]), run(EPISODES[1]))
+
+    def test_request_not_an_object(self):
+        with Client(self.path) as client:
+            for request in ([], "x", 1):
+                client.socket.sendall(_frame(request))
+                response = _read_frame(client._file)
+                self.assertIsNone(response["id"])
+                self.assertIn("JSON objects", response["error"])
+            self.assertEqual(client.check(EPISODES[1]), run(EPISODES[1]))
+
+    def test_socket_file(self):
+        with self.assertRaises(OSError):
+            Daemon(self.path).start()
+        self.daemon.stop()
+        self.assertFalse(os.path.exists(self.path))
+
+        # A socket left behind by a daemon that died is replaced.
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        self.daemon = Daemon(self.path).start()
+        with Client(self.path) as client:
+            self.assertEqual(client.check(EPISODES[0]), run(EPISODES[0]))
@@ -0,0 +1,76 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import unittest
+from codingerrors import run
+from codingerrors.utils import failures
+
+try:
+    import pandas as pd
+    import codingerrors.dataframe
+except ImportError:
+    pd = None
+
+
+@unittest.skipUnless(pd, "pandas is not installed")
+class TestDataFrame(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "ID": ["EP1", "EP2", "EP3", "EP4"],
+                "DIAG_01": ["J440", "D64", " j44.0 ", None],
+                "DIAG_02": ["J22", None, "J22", None],
+                "DIAG_03": [None, "", None, None],
+            },
+            index=[10, 11, 12, 13],
+        )
+        self.diag_cols = ["DIAG_01", "DIAG_02", "DIAG_03"]
+
+    def test_check(self):
+        found = self.df.codingerrors.check(diag_cols=self.diag_cols)
+        self.assertEqual(list(found.columns), codingerrors.dataframe.COLUMNS)
+        expected = [
+            (code, standard, operator, failure["note"])
+            for code, standard, operator, failure in failures(run(["J440", "J22"]))
+        ]
+        for row in (10, 12):
+            rows = found[found["row"] == row]
+            self.assertEqual(
+                list(
+                    zip(rows["code"], rows["standard"], rows["operator"], rows["note"])
+                ),
+                expected,
+            )
+        self.assertEqual(set(found["row"]), {10, 12})
+
+    def test_is_clean(self):
+        clean = self.df.codingerrors.is_clean(diag_cols=self.diag_cols, severity=None)
+        self.assertEqual(list(clean.index), [10, 11, 12, 13])
+        self.assertEqual(list(clean), [False, True, False, True])
+
+    def test_empty(self):
+        found = self.df.head(0).codingerrors.check(diag_cols=self.diag_cols)
+        self.assertEqual(len(found), 0)
+        self.assertEqual(list(found.columns), codingerrors.dataframe.COLUMNS)
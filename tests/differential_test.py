@@ -0,0 +1,60 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+from codingerrors.testing import PATHS, differential, random_episodes
+
+
+class TestDifferential(unittest.TestCase):
+    def test_random_episodes_are_seeded(self):
+        self.assertEqual(random_episodes(n=50, seed=3), random_episodes(n=50, seed=3))
+        self.assertNotEqual(
+            random_episodes(n=50, seed=3), random_episodes(n=50, seed=4)
+        )
+        self.assertTrue(all(0 < len(e) for e in random_episodes(n=50, max_codes=4)))
+        # OPCS-4 rule lists contain "", which must not be drawn as a code.
+        episodes = random_episodes("opcs4", n=2000, seed=1)
+        self.assertFalse(any("" in episode for episode in episodes))
+
+    def test_fast_paths_match_run(self):
+        for type in ("icd10", "opcs4"):
+            report = differential(type, random_episodes(type, n=400, seed=28))
+            self.assertEqual(set(report), set(PATHS) | {"run"})
+            for name in PATHS:
+                self.assertEqual(report[name]["mismatches"], [], (type, name))
+
+    def test_mismatches_are_reported(self):
+        check, agrees = PATHS["engine"]
+        PATHS["broken"] = (lambda type, episodes: [{} for e in episodes], agrees)
+        try:
+            report = differential("icd10", [["J440", "J22"], ["D64"]], ["broken"])
+        finally:
+            del PATHS["broken"]
+        self.assertEqual(len(report["broken"]["mismatches"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
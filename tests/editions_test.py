@@ -0,0 +1,90 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import datetime
+import unittest
+from codingerrors import run
+from codingerrors.editions import Editions
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+from codingerrors.testing import random_episodes
+
+# The primary position rule for U071 was removed on 28 September 2022.
+BEFORE = dict(icd10_standards_dict, **{"DSC.XXII.5:COVID-19:2:W": "?U071:^*"})
+EPISODE = ["J22", "B972", "U071"]
+
+
+class TestEditions(unittest.TestCase):
+    def setUp(self):
+        self.editions = Editions(
+            {"2020-04-01": BEFORE, datetime.date(2022, 9, 28): icd10_standards_dict}
+        )
+
+    def test_routing(self):
+        self.assertEqual(len(self.editions), 2)
+        before, after = self.editions.editions
+        self.assertIs(self.editions.edition_for("2022-09-27"), before)
+        self.assertIs(self.editions.edition_for("2022-09-28T10:00"), after)
+        self.assertIs(self.editions.edition_for(datetime.datetime(2030, 1, 1)), after)
+        with self.assertRaises(ValueError):
+            self.editions.edition_for("2019-01-01")
+
+    def test_duplicate_start(self):
+        with self.assertRaisesRegex(ValueError, "Duplicate edition start 2022-04-01"):
+            Editions(
+                {"2022-04-01": BEFORE, datetime.date(2022, 4, 1): icd10_standards_dict}
+            )
+
+    def test_matches_run(self):
+        for edition, standards in zip(
+            self.editions.editions, (BEFORE, icd10_standards_dict)
+        ):
+            standards_dict = _build_standards_dict(standards)
+            for codes in random_episodes(n=300, seed=43) + [EPISODE]:
+                self.assertEqual(
+                    edition.check(codes), run(codes, standards_dict=standards_dict)
+                )
+        self.assertNotEqual(
+            self.editions.check(EPISODE, "2021-01-01"),
+            self.editions.check(EPISODE, "2023-01-01"),
+        )
+
+    def test_shared(self):
+        # Only the U071 trigger differs between the two editions.
+        single = Editions({"2022-09-28": icd10_standards_dict})
+        self.assertEqual(self.editions.functions, single.functions + 1)
+
+    def test_check_batch(self):
+        episodes = [
+            ("EP1", "2023-01-01", EPISODE),
+            ("EP2", "2021-01-01", EPISODE),
+            ("EP3", "2023-01-01", ["J440", "J22"]),
+        ]
+        checked = list(self.editions.check_batch(episodes, batch_size=2))
+        self.assertEqual([id for id, _, _ in checked], ["EP1", "EP2", "EP3"])
+        self.assertEqual(
+            [edition.start.year for _, edition, _ in checked], [2022, 2020, 2022]
+        )
+        for (_, when, codes), (_, _, results) in zip(episodes, checked):
+            self.assertEqual(results, self.editions.check(codes, when))
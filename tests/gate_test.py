@@ -0,0 +1,76 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+import unittest.mock
+from codingerrors import gate, run, is_clean, first_failure
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+
+
+class TestGate(unittest.TestCase):
+    def test_clean_episodes(self):
+        self.assertTrue(is_clean(["D64"]))
+        self.assertTrue(is_clean(["F100", "T36", "T510"]))
+        self.assertIsNone(first_failure(["C81", "C79", "Z85"]))
+
+    def test_failing_episodes(self):
+        # DCS.X.5: J22 cannot be coded with J440
+        self.assertFalse(is_clean(["J440", "J22"]))
+        code, standard, rule = first_failure(["J440", "J22"])
+        self.assertIn(standard, run(["J440", "J22"])[code])
+        self.assertEqual(rule, "!")
+
+    def test_exception_clause(self):
+        self.assertFalse(is_clean(["F100", "T36"]))
+        self.assertTrue(is_clean(["F100", "T36", "T510"]))
+
+    def test_severity(self):
+        # DCS.XXII.5:COVID-19:0:W is the only standard U071 then B972 breaks
+        self.assertTrue(is_clean(["U071", "B972"], severity="E"))
+        self.assertFalse(is_clean(["U071", "B972"], severity="W"))
+
+    def test_opcs4(self):
+        self.assertFalse(is_clean(["Y001"], type="opcs4"))
+
+    def test_agrees_with_run(self):
+        for codes in (["D64", "C90"], ["N181", "N182"], ["Z371"], ["M4798"]):
+            self.assertEqual(first_failure(codes) == None, run(codes) == {})
+
+    def test_plan_is_cached(self):
+        standards_dict = _build_standards_dict(icd10_standards_dict)
+        with unittest.mock.patch.object(
+            gate, "_build_gate_plan", wraps=gate._build_gate_plan
+        ) as build:
+            for codes in (["J440", "J22"], ["D64"], ["F100", "T36"]):
+                self.assertEqual(
+                    is_clean(codes, standards_dict=standards_dict),
+                    is_clean(codes),
+                )
+            self.assertEqual(build.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
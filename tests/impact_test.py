@@ -0,0 +1,80 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import unittest
+from codingerrors import run
+from codingerrors.impact import EpisodeIndex, diff_standards, impact, touched_codes
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+
+EPISODES = [
+    ("EP1", ["J22", "B972", "U071"]),
+    ("EP2", ["U071", "J22"]),
+    ("EP3", ["J440", "J22"]),
+    ("EP4", ["L97", "E105"]),
+    ("EP5", ["P072", "P073"]),
+]
+
+
+class TestImpact(unittest.TestCase):
+    def test_diff_standards(self):
+        new = dict(icd10_standards_dict)
+        new["DSC.XXII.5:COVID-19:2:W"] = "?U071:^*"
+        new["DCS.XIX.1:E"] = "?S02:£S06,S07"
+        del new["DChS.XVIII.1:0:E"]
+        self.assertEqual(
+            diff_standards(icd10_standards_dict, new),
+            {
+                "added": ["DSC.XXII.5:COVID-19:2:W"],
+                "removed": ["DChS.XVIII.1:0:E"],
+                "changed": ["DCS.XIX.1:E"],
+            },
+        )
+        self.assertEqual(
+            touched_codes(icd10_standards_dict, new),
+            {"triggers": ["R030", "S02", "U071"], "values": ["I10", "S06", "S07"]},
+        )
+
+    def test_affected(self):
+        index = EpisodeIndex(EPISODES)
+        self.assertEqual(index.affected(["U071"]), {"EP1", "EP2"})
+        # X triggers and three character prefixes.
+        self.assertEqual(index.affected(["L97X"]), {"EP4"})
+        self.assertEqual(index.affected(["J44"]), {"EP3"})
+        self.assertEqual(index.affected(["P072&P073"]), {"EP5"})
+        self.assertEqual(index.affected(["Z000"]), set())
+
+    def test_impact(self):
+        # Reinstating the primary position rule for U071.
+        new = dict(icd10_standards_dict)
+        new["DSC.XXII.5:COVID-19:2:W"] = "?U071:^*"
+        report = impact(icd10_standards_dict, new, EPISODES)
+        self.assertEqual(report["checked"], 2)
+        self.assertEqual([d["id"] for d in report["diff"]], ["EP1"])
+
+        standards_dict = _build_standards_dict(new)
+        for d in report["diff"]:
+            codes = dict(EPISODES)[d["id"]]
+            self.assertEqual(d["before"], run(codes))
+            self.assertEqual(d["after"], run(codes, standards_dict=standards_dict))
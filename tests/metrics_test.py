@@ -0,0 +1,142 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import io
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from codingerrors import run
+from codingerrors.daemon import Daemon
+from codingerrors.metrics import (
+    JsonLines,
+    Metrics,
+    PrometheusFile,
+    Reporter,
+    serve_metrics,
+    severity_counts,
+)
+from codingerrors.pipeline import Pipeline
+
+EPISODES = [["J440", "J22"], ["D64"], ["F100", "T36"], ["J440", "J22"]]
+
+
+def _expected() -> dict:
+    counts = {}
+    for episode in EPISODES:
+        severity_counts(run(episode), counts)
+    return counts
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus(self):
+        metrics = Metrics()
+        metrics.inc("episodes", 3)
+        metrics.inc("failures", 2, severity="E")
+        metrics.set("queue_depth", 4, stage="check")
+        metrics.observe("batch_seconds", 0.003, stage="check")
+        metrics.observe("batch_seconds", 20, stage="check")
+        lines = metrics.prometheus().splitlines()
+        self.assertIn("# TYPE codingerrors_episodes_total counter", lines)
+        self.assertIn("codingerrors_episodes_total 3", lines)
+        self.assertIn('codingerrors_failures_total{severity="E"} 2', lines)
+        self.assertIn('codingerrors_queue_depth{stage="check"} 4', lines)
+        self.assertIn(
+            'codingerrors_batch_seconds_bucket{stage="check",le="0.0025"} 0', lines
+        )
+        self.assertIn(
+            'codingerrors_batch_seconds_bucket{stage="check",le="0.005"} 1', lines
+        )
+        self.assertIn(
+            'codingerrors_batch_seconds_bucket{stage="check",le="+Inf"} 2', lines
+        )
+        self.assertIn('codingerrors_batch_seconds_count{stage="check"} 2', lines)
+
+    def test_sinks(self):
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as directory:
+            prometheus = os.path.join(directory, "metrics.prom")
+            jsonl = os.path.join(directory, "metrics.jsonl")
+            reporter = Reporter(metrics, [PrometheusFile(prometheus), JsonLines(jsonl)])
+            metrics.inc("episodes", 10)
+            reporter.report()
+            metrics.inc("episodes", 5)
+            reporter.stop()
+            with open(prometheus) as f:
+                self.assertIn("codingerrors_episodes_total 15\n", f.read())
+            with open(jsonl) as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual([l["counters"]["episodes"] for l in lines], [10, 15])
+            self.assertNotIn("rates", lines[0])
+            self.assertGreater(lines[1]["rates"]["episodes"], 0)
+            self.assertEqual(
+                sorted(os.listdir(directory)), ["metrics.jsonl", "metrics.prom"]
+            )
+
+    def test_http(self):
+        metrics = Metrics()
+        metrics.inc("episodes")
+        server = serve_metrics(metrics, 0)
+        try:
+            url = "http://127.0.0.1:%i/metrics" % (server.server_address[1])
+            with urllib.request.urlopen(url, timeout=10) as response:
+                self.assertIn(b"codingerrors_episodes_total 1", response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_pipeline(self):
+        lines = ["EP%i,%s\n" % (i, ",".join(e)) for i, e in enumerate(EPISODES)]
+        for workers in (0, 1):
+            metrics = Metrics()
+            Pipeline(workers=workers, batch_size=2, metrics=metrics).run(
+                lines, io.StringIO()
+            )
+            snapshot = metrics.snapshot()
+            self.assertEqual(snapshot["counters"]["episodes"], len(EPISODES))
+            for name, count in _expected().items():
+                series = 'failures{severity="%s"}' % (name.split(":")[1])
+                self.assertEqual(snapshot["counters"][series], count)
+            check = snapshot["histograms"]['batch_seconds{stage="check"}']
+            self.assertEqual(check["count"], 2)
+            self.assertEqual(snapshot["gauges"]['queue_depth{stage="write"}'], 0)
+            self.assertIn("worker_utilisation", snapshot["gauges"])
+            self.assertEqual(metrics.collectors, [])
+
+    def test_daemon(self):
+        metrics = Metrics()
+        daemon = Daemon("unused.sock", ["icd10"], metrics=metrics)
+        daemon.respond({"op": "check", "episodes": EPISODES})
+        daemon.respond({"op": "check", "type": "icd11", "episodes": EPISODES})
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["episodes"], len(EPISODES))
+        self.assertEqual(snapshot["counters"]['errors{op="check"}'], 1)
+        self.assertEqual(
+            snapshot["histograms"]['request_seconds{op="check"}']["count"], 2
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
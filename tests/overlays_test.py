@@ -0,0 +1,87 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+import os
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.cli import main
+from codingerrors.compiler import get_engine
+from codingerrors.overlays import Overlay
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+
+EPISODE = ["J440", "J22"]
+LOCAL = {"LOCAL.1:0:E": "?D64:!J22"}
+
+
+class TestOverlay(unittest.TestCase):
+    def test_apply(self):
+        overlay = Overlay(
+            {"DCS.X.5:0:E": "?J44:!J21", **LOCAL},
+            disable=["DCS.XV"],
+            disable_severities=["w"],
+        )
+        merged = overlay.merged()
+        self.assertEqual(merged["DCS.X.5:0:E"], "?J44:!J21")
+        self.assertEqual(list(merged)[-1], "LOCAL.1:0:E")
+        self.assertFalse(any(k.startswith("DCS.XV.") for k in merged))
+        self.assertFalse(any(k.endswith(":W") for k in merged))
+        self.assertIn("DCS.X.5:1:E", merged)
+        self.assertNotIn("LOCAL.1:0:E", icd10_standards_dict)
+
+    def test_matches_run(self):
+        overlay = Overlay(LOCAL, disable=["DCS.X.5"])
+        standards_dict = _build_standards_dict(overlay.merged())
+        for episode in (EPISODE, ["D64", "J22"], ["D64"]):
+            self.assertEqual(
+                overlay.check(episode), run(episode, standards_dict=standards_dict)
+            )
+        self.assertEqual(overlay.check(EPISODE), {})
+        self.assertIn("D64", overlay.check(["D64", "J22"]))
+
+    def test_compiled_once(self):
+        first, second = Overlay(LOCAL), Overlay(dict(LOCAL))
+        self.assertIs(first.engine(), second.engine())
+        self.assertIs(first.engine(), get_engine("icd10", first.merged()))
+        self.assertIs(Overlay().engine(), get_engine("icd10"))
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "episodes.csv")
+            target = os.path.join(directory, "results.jsonl")
+            overlay = os.path.join(directory, "overlay.json")
+            with open(source, "w") as f:
+                f.write("EP1,J440,J22\nEP2,D64,J22\n")
+            with open(overlay, "w") as f:
+                json.dump({"standards": LOCAL, "disable": ["DCS.X.5"]}, f)
+            args = ["check", source, target, "--workers", "0", "--overlay", overlay]
+            self.assertEqual(main(args), 0)
+            with open(target) as f:
+                results = [json.loads(line) for line in f]
+            self.assertEqual([r["results"] == {} for r in results], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from codingerrors import run
+from codingerrors.cli import main
+from codingerrors.pipeline import Pipeline, normalise, parse_csv
+
+LINES = [
+    "EP1,J440,J22\n",
+    "EP2,D64,,\n",
+    "\n",
+    "EP3, f10.0 ,T36\n",
+    "EP4,F100,T36,T510\n",
+]
+
+
+def _read(output: str) -> list:
+    return [json.loads(line) for line in output.splitlines()]
+
+
+class TestPipeline(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(normalise(" j44.0 "), "J440")
+        self.assertEqual(
+            parse_csv(LINES[1:4]), [("EP2", ["D64"]), None, ("EP3", ["F100", "T36"])]
+        )
+
+    def test_matches_run(self):
+        for workers in (0, 1):
+            output = io.StringIO()
+            stats = Pipeline(workers=workers, batch_size=2, queue_size=1).run(
+                LINES, output
+            )
+            rows = _read(output.getvalue())
+            self.assertEqual([row["record"] for row in rows], [0, 1, 3, 4])
+            self.assertEqual([row["id"] for row in rows], ["EP1", "EP2", "EP3", "EP4"])
+            for row, codes in zip(rows, (["J440", "J22"], ["D64"], ["F100", "T36"])):
+                self.assertEqual(row["results"], run(codes))
+            self.assertEqual(stats["episodes"], 4)
+            for stage in stats["stages"].values():
+                self.assertLessEqual(stage["max_queue_depth"], 1)
+
+    def test_dedup_stats(self):
+        stats = Pipeline(workers=0).run(LINES + ["EP5,J440,J22\n"], io.StringIO())
+        self.assertEqual(stats["dedup"], {"episodes": 5, "distinct": 4, "ratio": 0.2})
+
+    def test_shared_rules(self):
+        output = io.StringIO()
+        Pipeline(workers=1, shared_rules=True).run(LINES, output)
+        self.assertEqual(_read(output.getvalue())[0]["results"], run(["J440", "J22"]))
+        with self.assertRaises(ValueError):
+            Pipeline(type="icd9", shared_rules=True).run(LINES, io.StringIO())
+
+    def test_errors_propagate(self):
+        def parse(lines):
+            raise ValueError("bad extract")
+
+        with self.assertRaises(ValueError):
+            Pipeline(workers=0, parse=parse).run(LINES * 100, io.StringIO())
+
+    @unittest.mock.patch("threading.excepthook")
+    def test_dead_stage(self, excepthook):
+        # A hook that fails kills each stage thread before its target runs.
+        def hook(*args):
+            raise RuntimeError("hook failed")
+
+        threading.setprofile(hook)
+        try:
+            with self.assertRaises(RuntimeError):
+                Pipeline(workers=0).run(LINES, io.StringIO())
+        finally:
+            threading.setprofile(None)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "episodes.csv")
+            target = os.path.join(directory, "results.jsonl")
+            with open(source, "w") as f:
+                f.writelines(LINES)
+            self.assertEqual(main(["check", source, target, "--workers", "0"]), 0)
+            with open(target) as f:
+                self.assertEqual(len(_read(f.read())), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+import os
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.cli import main
+from codingerrors.compiler import get_engine
+from codingerrors.profiles import Profile, get_profile, operators
+from codingerrors.testing import random_episodes
+
+
+class TestProfile(unittest.TestCase):
+    def test_operators(self):
+        self.assertEqual(operators("?F100:!T36-T50:@T510"), {"!"})
+        self.assertEqual(operators("?O60-O75:>Z37"), {">"})
+
+    def test_select(self):
+        merged = Profile(keys=["DCS.XV.*"], severities=["e"]).merged()
+        self.assertTrue(merged)
+        self.assertTrue(all(k.startswith("DCS.XV.") for k in merged))
+        self.assertTrue(all(k.endswith(":E") for k in merged))
+        merged = Profile(operators=["!"]).merged()
+        self.assertTrue(all("!" in operators(v) for v in merged.values()))
+        placement = get_profile("placement").merged("opcs4")
+        self.assertTrue(placement)
+        self.assertTrue(all("PLAC" in k for k in placement))
+        with self.assertRaises(ValueError):
+            get_profile("nothing")
+
+    def test_smaller_engine(self):
+        full = get_engine()
+        engine = get_profile("obstetrics").engine()
+        self.assertLess(len(engine.standards_dict), len(full.standards_dict))
+        self.assertNotIn("chunk_keys", engine.source)
+        self.assertIs(engine, get_profile("obstetrics").engine())
+
+    def test_matches_run(self):
+        for type, profile in (("icd10", "obstetrics"), ("opcs4", "placement")):
+            engine = get_profile(profile).engine(type)
+            for icd10s in random_episodes(type, n=300, seed=3):
+                try:
+                    expected = run(icd10s, type, standards_dict=engine.standards_dict)
+                except Exception:
+                    continue
+                self.assertEqual(engine.check(icd10s), expected)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "episodes.csv")
+            target = os.path.join(directory, "results.jsonl")
+            overlay = os.path.join(directory, "overlay.json")
+            with open(source, "w") as f:
+                f.write("EP1,J440,J22\nEP2,D64,J22\n")
+            with open(overlay, "w") as f:
+                json.dump({"standards": {"LOCAL.1:0:W": "?D64:!J22"}}, f)
+            args = ["check", source, target, "--workers", "0", "--profile", "errors"]
+            self.assertEqual(main(args + ["--overlay", overlay]), 0)
+            with open(target) as f:
+                results = [json.loads(line) for line in f]
+            self.assertEqual([r["results"] == {} for r in results], [False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import os
+import pstats
+import sys
+import tempfile
+import time
+import unittest
+from codingerrors import run
+from codingerrors.check import _check_rule
+from codingerrors.cli import main
+from codingerrors.profiling import Profiler, collapse, profiled
+
+
+class _Values(list):
+    # Collapses the stack of whatever iterates over it.
+    def __iter__(self):
+        self.stack = collapse(sys._getframe(1), "MainThread")
+        return super().__iter__()
+
+
+class TestProfiling(unittest.TestCase):
+    def test_collapse(self):
+        values = _Values(["J22"])
+        _check_rule({}, "DCS.X.5:0:E", "!", values, ["J440", "J22"], "J440")
+        frames = values.stack.split(";")
+        self.assertEqual(frames[0], "MainThread")
+        self.assertEqual(frames[-1], "codingerrors.check:_check_rule_values")
+        self.assertEqual(frames[-2], "codingerrors.check:_check_rule [DCS.X.5:0:E]")
+
+    def test_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run")
+            with profiled(path, interval=0.001) as profiler:
+                end = time.perf_counter() + 0.2
+                while time.perf_counter() < end:
+                    run(["J440", "J22"])
+            stats = pstats.Stats(path + ".pstats")
+            self.assertIn("_check_against_standard", {f[2] for f in stats.stats})
+            with open(path + ".folded") as f:
+                lines = f.read().splitlines()
+            self.assertTrue(lines)
+            for line in lines:
+                stack, count = line.rsplit(" ", 1)
+                self.assertTrue(stack.startswith("MainThread;"))
+                self.assertGreater(int(count), 0)
+            self.assertEqual(
+                sum(profiler.stacks.values()),
+                sum(int(line.rsplit(" ", 1)[1]) for line in lines),
+            )
+
+    def test_sample(self):
+        profiler = Profiler("sample", interval=0.001)
+        profiler.start()
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+        profiler.stop()
+        self.assertTrue(profiler.stacks)
+        with self.assertRaises(ValueError):
+            profiler.stats()
+        with self.assertRaises(ValueError):
+            Profiler("trace")
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "episodes.csv")
+            target = os.path.join(directory, "results.jsonl")
+            path = os.path.join(directory, "check")
+            with open(source, "w") as f:
+                f.write("EP1,J440,J22\n" * 200)
+            self.assertEqual(
+                main(["check", source, target, "--profile-output", path]), 0
+            )
+            stats = pstats.Stats(path + ".pstats")
+            self.assertIn("check_batch", {f[2] for f in stats.stats})
+            self.assertTrue(os.path.exists(path + ".folded"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import tempfile
+import unittest
+from codingerrors.compiler import get_engine
+from codingerrors.readers import FixedWidthLayout, read_fixed_width
+
+# 4 character id, then three 5 character code slots.
+RECORDS = [
+    b"0001J440 J22            \n",
+    b"0002     D64            \n",
+    b"                        \n",
+    b"0003F100 T36  T510      \n",
+]
+LAYOUT = FixedWidthLayout((0, 4), [(4, 5), (9, 5), (14, 5)], 25)
+
+
+class TestFixedWidth(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "extract.dat")
+        with open(self.path, "wb") as f:
+            f.writelines(RECORDS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read(self):
+        expected = [
+            ("0001", ["J440", "J22"]),
+            ("0002", ["D64"]),
+            ("0003", ["F100", "T36", "T510"]),
+        ]
+        self.assertEqual(list(read_fixed_width(self.path, LAYOUT)), expected)
+        # Without a record length records are split on newlines instead.
+        layout = FixedWidthLayout(LAYOUT.id, LAYOUT.codes)
+        self.assertEqual(list(read_fixed_width(self.path, layout)), expected)
+
+    def test_short_and_unterminated_records(self):
+        with open(self.path, "wb") as f:
+            f.write(b"0001J440 J22\n0002D64")
+        layout = FixedWidthLayout(LAYOUT.id, LAYOUT.codes)
+        self.assertEqual(
+            list(read_fixed_width(self.path, layout)),
+            [("0001", ["J440", "J22"]), ("0002", ["D64"])],
+        )
+
+    def test_empty_file(self):
+        open(self.path, "wb").close()
+        self.assertEqual(list(read_fixed_width(self.path, LAYOUT)), [])
+
+    def test_overlapping_fields(self):
+        with self.assertRaises(ValueError):
+            list(read_fixed_width(self.path, FixedWidthLayout((0, 6), [(4, 5)])))
+
+    def test_short_record_length(self):
+        layout = FixedWidthLayout((0, 6), [(6, 6), (12, 6)], record_length=10)
+        with self.assertRaises(ValueError):
+            list(read_fixed_width(self.path, layout))
+
+    def test_layout_from_json(self):
+        path = os.path.join(self.directory.name, "layout.json")
+        with open(path, "w") as f:
+            json.dump({"id": [0, 4], "codes": [[4, 5], [9, 5], [14, 5]]}, f)
+        layout = FixedWidthLayout.from_json(path)
+        self.assertEqual(len(list(read_fixed_width(self.path, layout))), 3)
+
+    def test_into_batch_checker(self):
+        engine = get_engine("icd10")
+        results = dict(engine.check_batch(read_fixed_width(self.path, LAYOUT)))
+        self.assertEqual(results["0001"], engine.check(["J440", "J22"]))
+        self.assertEqual(results["0003"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
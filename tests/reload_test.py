@@ -0,0 +1,127 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.cache import ResultCache
+from codingerrors.daemon import Daemon
+from codingerrors.reload import ReloadableEngine, load_standards
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+
+# Reinstates the primary position rule for U071.
+NEW = dict(icd10_standards_dict, **{"DSC.XXII.5:COVID-19:2:W": "?U071:^*"})
+EPISODE = ["J22", "B972", "U071"]
+
+
+class TestReload(unittest.TestCase):
+    def test_reload(self):
+        engine = ReloadableEngine()
+        old = engine.version
+        self.assertEqual(engine.check(EPISODE), (old, run(EPISODE)))
+
+        version = engine.reload(NEW).result(timeout=60)
+        self.assertNotEqual(version, old)
+        self.assertEqual(engine.version, version)
+        self.assertEqual(
+            engine.check(EPISODE),
+            (version, run(EPISODE, standards_dict=_build_standards_dict(NEW))),
+        )
+        self.assertEqual(engine.reload(NEW, version="2024-10").result(60), "2024-10")
+
+    def test_in_flight(self):
+        engine = ReloadableEngine()
+        old = engine.version
+        checked = engine.check_batch(enumerate([EPISODE] * 3), batch_size=1)
+        # Reloaded after the call but before iteration starts.
+        engine.reload(NEW, background=False)
+        first = next(checked)
+        engine.reload(NEW, background=False)
+        self.assertEqual([first[1]] + [v for _, v, _ in checked], [old] * 3)
+        self.assertNotEqual(engine.check(EPISODE)[0], old)
+
+    def test_rejected(self):
+        def reject(engine):
+            raise ValueError("not this one")
+
+        engine = ReloadableEngine()
+        old = engine.version
+        with self.assertRaises(ValueError):
+            engine.reload(NEW, verify=reject).result(timeout=60)
+        self.assertEqual(engine.version, old)
+
+    def test_cache(self):
+        engine = ReloadableEngine()
+        cache = ResultCache(":memory:")
+        list(engine.check_batch([(0, EPISODE)], cache))
+        engine.reload(NEW, background=False)
+        checked = list(engine.check_batch([(0, EPISODE)], cache))
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertNotEqual(checked[0][2], run(EPISODE))
+        cache.close()
+
+    def test_load_standards(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "standards.json")
+            with open(path, "w") as f:
+                json.dump({"LOCAL:0:E": "?J440:!J22"}, f)
+            self.assertEqual(load_standards(path), {"LOCAL:0:E": "?J440:!J22"})
+
+            path = os.path.join(directory, "standards.py")
+            with open(path, "w") as f:
+                f.write('opcs4_standards_dict = {"LOCAL:0:E": "?Y001:/*"}\n')
+            self.assertEqual(
+                load_standards(path, type="opcs4"), {"LOCAL:0:E": "?Y001:/*"}
+            )
+
+    def test_daemon(self):
+        daemon = Daemon(os.path.join(tempfile.gettempdir(), "unused.sock"))
+        request = {"id": 1, "episodes": [EPISODE]}
+        old = daemon.respond(request)["version"]
+        version = daemon.reload(NEW).result(timeout=60)
+        response = daemon.respond(request)
+        self.assertEqual(response["version"], version)
+        self.assertNotEqual(version, old)
+        self.assertEqual(daemon.respond({"op": "ping"})["versions"]["icd10"], version)
+
+    def test_cli_does_not_import_the_test_harness(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        done = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, codingerrors.cli\n"
+                "print(sorted({'pandas', 'codingerrors.testing'} & set(sys.modules)))",
+            ],
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, PYTHONPATH=root),
+            check=True,
+        )
+        self.assertEqual(done.stdout.strip(), "[]")
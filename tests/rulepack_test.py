@@ -0,0 +1,123 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from codingerrors import run
+from codingerrors.compiler import ruleset_hash
+from codingerrors.rulepack import RulePack, attach, open_pack, pack, publish, write_pack
+from codingerrors.standards import icd10_standards_dict, opcs4_standards_dict
+from codingerrors.standards import _build_standards_dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _check_attached(args):
+    name, codes = args
+    rule_pack = attach(name)
+    try:
+        return rule_pack.check(codes)
+    finally:
+        rule_pack.close()
+
+
+class TestRulePack(unittest.TestCase):
+    def test_lookup(self):
+        rule_pack = RulePack(pack(icd10_standards_dict))
+        standards_dict = _build_standards_dict(icd10_standards_dict)
+        self.assertEqual(len(rule_pack), len(standards_dict))
+        self.assertEqual(rule_pack.ruleset_hash, ruleset_hash(icd10_standards_dict))
+        self.assertEqual(rule_pack.get("J440"), standards_dict["J440"])
+        self.assertIn("P072&P073", rule_pack)
+        self.assertNotIn("J44", rule_pack)
+        self.assertIsNone(rule_pack.get("ZZZZ"))
+
+    def test_check(self):
+        rule_pack = RulePack(pack(icd10_standards_dict))
+        for codes in (["J440", "J22"], ["F100", "T36", "T510"], ["P072", "P073"]):
+            self.assertEqual(rule_pack.check(codes), run(codes))
+
+    def test_rejects_other_buffers(self):
+        with self.assertRaises(ValueError):
+            RulePack(b"\0" * 128)
+
+    def test_mmap_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "opcs4.pack")
+            write_pack(path, opcs4_standards_dict)
+            rule_pack = open_pack(path)
+            self.assertEqual(rule_pack.check(["Y001"]), run(["Y001"], type="opcs4"))
+            rule_pack.close()
+
+    def test_shared_memory_workers(self):
+        segment = publish(icd10_standards_dict)
+        try:
+            episodes = [["J440", "J22"], ["D64", "C90"], ["D64"]]
+            with multiprocessing.get_context("spawn").Pool(2) as pool:
+                results = pool.map(
+                    _check_attached, [(segment.name, e) for e in episodes]
+                )
+            self.assertEqual(results, [run(e) for e in episodes])
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def test_unrelated_reader_exits(self):
+        # A reader with its own resource tracker must not unlink the
+        # segment when it exits.
+        segment = publish(icd10_standards_dict)
+        try:
+            reader = (
+                "import sys\n"
+                "from codingerrors.rulepack import attach\n"
+                "rule_pack = attach(sys.argv[1])\n"
+                "print(rule_pack.ruleset_hash)\n"
+                "rule_pack.close()\n"
+            )
+            environment = dict(os.environ, PYTHONPATH=ROOT)
+            done = subprocess.run(
+                [sys.executable, "-c", reader, segment.name],
+                capture_output=True,
+                text=True,
+                env=environment,
+                check=True,
+            )
+            self.assertEqual(done.stdout.strip(), ruleset_hash(icd10_standards_dict))
+            self.assertNotIn("leaked", done.stderr)
+            rule_pack = attach(segment.name)
+            self.assertEqual(rule_pack.check(["J440", "J22"]), run(["J440", "J22"]))
+            rule_pack.close()
+        finally:
+            segment.close()
+            segment.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import io
+import json
+import random
+import time
+import unittest
+from codingerrors import run
+from codingerrors.compiler import get_engine
+from codingerrors.pipeline import Pipeline
+from codingerrors.standards import _build_standards_dict, icd10_standards_dict
+from codingerrors.testing import random_episodes
+from codingerrors.utils import MAX_CODES_STANDARD, failures
+
+POOL = sorted({code for e in random_episodes(n=2000, seed=0) for code in e})
+
+
+def _episodes(n: int, count: int) -> list:
+    rng = random.Random(n)
+    return [[rng.choice(POOL) for _ in range(n)] for _ in range(count)]
+
+
+def _per_code(engine, n: int) -> float:
+    # Best of several passes, per code checked.
+    episodes = _episodes(n, max(10000 // n, 5))
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for icd10s in episodes:
+            engine.check(icd10s)
+        elapsed = (time.perf_counter() - start) / (len(episodes) * n)
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+
+class TestScaling(unittest.TestCase):
+    def test_near_linear(self):
+        engine = get_engine()
+        base = _per_code(engine, 50)
+        for n in (100, 250, 500):
+            self.assertLess(_per_code(engine, n), base * 3, n)
+
+    def test_long_episodes_match_run(self):
+        engine = get_engine()
+        standards_dict = _build_standards_dict(icd10_standards_dict)
+        for icd10s in _episodes(300, 3):
+            self.assertEqual(
+                engine.check(icd10s), run(icd10s, standards_dict=standards_dict)
+            )
+
+
+class TestMaxCodes(unittest.TestCase):
+    def test_check_batch(self):
+        episodes = [(0, ["J440", "J22"]), (1, ["J22"] * 6), (2, ["J440", "J22"])]
+        stats = {}
+        checked = list(
+            get_engine().check_batch(episodes, batch_size=2, stats=stats, max_codes=5)
+        )
+        self.assertEqual([i for i, _ in checked], [0, 1, 2])
+        self.assertEqual(checked[0][1], run(["J440", "J22"]))
+        self.assertEqual(checked[2][1], run(["J440", "J22"]))
+        [(code, standard, operator, failure)] = failures(checked[1][1])
+        self.assertEqual((code, standard), ("*", MAX_CODES_STANDARD))
+        self.assertIn("6 codes", failure["note"])
+        self.assertEqual(stats["limited"], 1)
+        self.assertEqual(stats["episodes"], 2)
+
+    def test_pipeline(self):
+        lines = ["EP1,J440,J22\n", "EP2,%s\n" % (",".join(["J22"] * 20))]
+        output = io.StringIO()
+        report = Pipeline(workers=0, max_codes=10).run(lines, output)
+        results = [
+            json.loads(line)["results"] for line in output.getvalue().splitlines()
+        ]
+        self.assertEqual(results[0], run(["J440", "J22"]))
+        self.assertEqual(list(results[1]), ["*"])
+        self.assertEqual(report["limited"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
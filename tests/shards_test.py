@@ -0,0 +1,128 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from codingerrors.cli import main
+from codingerrors.pipeline import Pipeline
+from codingerrors.shards import Manifest, count, merge, shard, shard_of
+
+CODES = ["J440", "J22", "D64", "F100", "T36", "O800", "Z370", "S720", "I10"]
+LINES = [
+    "EP%i,%s\n" % (i, ",".join(CODES[i % 5 : i % 5 + i % 4 + 1])) if i % 9 else "\n"
+    for i in range(150)
+]
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = self._path("in.csv")
+        with open(self.input, "w") as file:
+            file.writelines(LINES)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def _read(self, name: str) -> bytes:
+        with open(self._path(name), "rb") as file:
+            return file.read()
+
+    def _shard_results(self, shards: int) -> list:
+        paths = []
+        for path in shard(self.input, shards, self.directory.name):
+            manifest = Manifest.from_json(path)
+            output = self._path("results-%i.jsonl" % (manifest.shard))
+            with open(self.input, newline="") as source, open(output, "w") as out:
+                Pipeline(workers=0, batch_size=7).run(manifest.select(source), out)
+            paths.append(output)
+        return paths
+
+    def test_shard_of(self):
+        self.assertEqual(shard_of("EP1", 4), shard_of("EP1", 4))
+        self.assertEqual({shard_of("EP%i" % (i), 4) for i in range(100)}, {0, 1, 2, 3})
+
+    def test_manifests_cover_every_episode_once(self):
+        paths = shard(self.input, 3, self.directory.name)
+        selected = [list(Manifest.from_json(path).select(LINES)) for path in paths]
+        for lines in zip(LINES, *selected):
+            kept = [line for line in lines[1:] if line != ""]
+            self.assertEqual(kept, [] if lines[0] == "\n" else [lines[0]])
+        with open(paths[0]) as file:
+            self.assertEqual(json.load(file)["shards"], 3)
+
+    def test_merge_matches_single_run(self):
+        Pipeline(workers=0).run_file(self.input, self._path("single.jsonl"))
+        expected = self._read("single.jsonl")
+        with open(self._path("single.jsonl")) as file:
+            expected_counts = count(file)
+        paths = self._shard_results(3)
+        for order in itertools.permutations(paths):
+            counts = merge(
+                list(order), self._path("merged.jsonl"), self._path("counts.json")
+            )
+            self.assertEqual(self._read("merged.jsonl"), expected)
+            self.assertEqual(counts, expected_counts)
+            self.assertEqual(json.loads(self._read("counts.json")), expected_counts)
+        self.assertGreater(expected_counts["failures:E"], 0)
+
+    def test_merge_rejects_overlap(self):
+        paths = self._shard_results(2)
+        with self.assertRaises(ValueError):
+            merge(paths + paths[:1], self._path("merged.jsonl"))
+
+    def test_other_input(self):
+        path = shard(self.input, 2, self.directory.name)[0]
+        with open(self.input, "a") as file:
+            file.write("EP999,J440\n")
+        with self.assertRaises(ValueError):
+            Manifest.from_json(path).check_input(self.input)
+
+    def test_cli(self):
+        main(["check", self.input, self._path("single.jsonl"), "--workers", "0"])
+        main(["shard", self.input, "2", self._path("shards")])
+        results = []
+        for index in (1, 0):
+            results.append(self._path("results-%i.jsonl" % (index)))
+            manifest = os.path.join("shards", "shard-%05i.json" % (index))
+            main(
+                [
+                    "check",
+                    self.input,
+                    results[-1],
+                    "--workers",
+                    "0",
+                    "--manifest",
+                    self._path(manifest),
+                ]
+            )
+        main(["merge", self._path("merged.jsonl")] + results)
+        self.assertEqual(self._read("merged.jsonl"), self._read("single.jsonl"))
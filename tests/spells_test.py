@@ -0,0 +1,75 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import unittest
+from codingerrors import run
+from codingerrors.spells import check_spells, split_standards
+from codingerrors.standards import icd10_standards_dict
+
+EPISODES = [
+    ("S1", "E1", ["O300"]),
+    ("S1", "E2", ["Z372"]),
+    ("S2", "E3", ["Z372", "J22"]),
+    ("S3", "E4", ["O244"]),
+    ("S3", "E5", ["E109", "J440", "J22"]),
+]
+
+
+class TestSpells(unittest.TestCase):
+    def test_split_standards(self):
+        episode, spell = split_standards(icd10_standards_dict, ["DCS.XV.14:0:E"])
+        self.assertEqual(spell, {"DCS.XV.14:0:E": "?Z372-Z377:{O30"})
+        self.assertEqual(len(episode) + 1, len(icd10_standards_dict))
+
+    def test_check_spells(self):
+        spells = list(check_spells(EPISODES))
+        self.assertEqual([spell_id for spell_id, _, _ in spells], ["S1", "S2", "S3"])
+        self.assertEqual(
+            [[episode_id for episode_id, _ in checked] for _, checked, _ in spells],
+            [["E1", "E2"], ["E3"], ["E4", "E5"]],
+        )
+        # Birth outcome and delivery in different episodes of one spell.
+        self.assertEqual(spells[0][2], {})
+        self.assertIn("DCS.XV.14:0:E", spells[1][2]["Z372"])
+        self.assertIn("DCS.XV.9:0:E", spells[2][2]["O244"])
+        # Episode level results leave out the spell level standards.
+        self.assertEqual(spells[1][1][0][1], {})
+        self.assertEqual(spells[2][1][1][1], run(["E109", "J440", "J22"]))
+
+    def test_streaming(self):
+        read = []
+
+        def source():
+            for episode in EPISODES:
+                read.append(episode[1])
+                yield episode
+
+        spells = check_spells(source())
+        self.assertEqual(next(spells)[0], "S1")
+        self.assertEqual(read, ["E1", "E2", "E3"])
+
+    def test_unsorted(self):
+        with self.assertRaises(ValueError):
+            list(check_spells(EPISODES[2:] + EPISODES[:2]))
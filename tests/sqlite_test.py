@@ -0,0 +1,105 @@
+# The MIT License
+#
+# Copyright (c) 2022 Keiron O'Shea
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to
+# deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom
+# the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import sqlite3
+import unittest
+from codingerrors import run
+from codingerrors.sqlite import check_sqlite
+
+
+class TestSQLite(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE episodes (id, d1, d2, d3)")
+        self.connection.executemany(
+            "INSERT INTO episodes VALUES (?, ?, ?, ?)",
+            [
+                (1, "J440", "J22", None),
+                (2, "D64", "", None),
+                (3, "F100", "T36", None),
+                (4, "F100", "T36", "T510"),
+                (5, "J44.0", "j22", None),
+            ],
+        )
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_check(self):
+        stats = check_sqlite(
+            self.connection, "SELECT id, d1, d2, d3 FROM episodes", batch_size=2
+        )
+        self.assertEqual(stats["episodes"], 5)
+        self.assertEqual(stats["failing_episodes"], 3)
+        self.assertEqual(stats["batches"], 3)
+
+        rows = self.connection.execute(
+            "SELECT code, standard, operator, note FROM coding_errors "
+            "WHERE episode_id = 1"
+        ).fetchall()
+        results = run(["J440", "J22"])
+        self.assertEqual(
+            rows,
+            [
+                (code, standard, operator, failure["note"])
+                for code, standards in results.items()
+                for standard, rules in standards.items()
+                for operator, failure in rules.items()
+            ],
+        )
+        self.assertEqual(
+            self.connection.execute(
+                "SELECT COUNT(*) FROM coding_errors WHERE episode_id = 5"
+            ).fetchone()[0],
+            len(rows),
+        )
+
+    def test_indexes_and_replace(self):
+        query = "SELECT id, d1, d2, d3 FROM episodes WHERE id = ?"
+        check_sqlite(self.connection, query, (1,), results_table="audit")
+        check_sqlite(self.connection, query, (1,), results_table="audit")
+        count = "SELECT COUNT(*) FROM audit"
+        self.assertEqual(self.connection.execute(count).fetchone()[0], 1)
+        # Other episodes are added alongside.
+        check_sqlite(self.connection, query, (3,), results_table="audit")
+        self.assertGreater(self.connection.execute(count).fetchone()[0], 1)
+        check_sqlite(self.connection, query, (1,), results_table="audit", replace=True)
+        self.assertEqual(self.connection.execute(count).fetchone()[0], 1)
+
+        indexes = self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'audit' AND sql IS NOT NULL"
+        ).fetchall()
+        self.assertEqual(sorted(indexes), [("audit_episode",), ("audit_standard",)])
+
+    def test_table_name_is_checked(self):
+        with self.assertRaises(ValueError):
+            check_sqlite(self.connection, "SELECT 1", results_table="x; DROP TABLE y")
+
+
+if __name__ == "__main__":
+    unittest.main()